@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 
@@ -48,14 +50,29 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'LittleLemonAPI.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'LittleLemonAPI.middleware.MetricsMiddleware',
 ]
 
+# gzip (and brotli, if the brotli package is installed) for response bodies
+# of at least COMPRESSION_MIN_SIZE bytes. Cached catalog responses keep
+# their compressed bytes next to the plain ones.
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 4
+
+# Per-view latency/SQL histograms, served at /api/metrics to staff users.
+# Requests slower than METRICS_SLOW_REQUEST_MS are logged; with
+# METRICS_LOG_SLOW_SQL their statements are logged too.
+METRICS_SLOW_REQUEST_MS = int(os.environ.get('METRICS_SLOW_REQUEST_MS', 500))
+METRICS_LOG_SLOW_SQL = os.environ.get('METRICS_LOG_SLOW_SQL', '') == '1'
+
 ROOT_URLCONF = 'LittleLemon.urls'
 
 TEMPLATES = [
@@ -80,13 +97,103 @@ WSGI_APPLICATION = 'LittleLemon.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# DATABASE_ENGINE selects the backend: sqlite3 (default), postgresql or
+# mysql, or a full dotted path. Server databases read the usual
+# DATABASE_NAME/USER/PASSWORD/HOST/PORT variables.
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite3')
+if '.' not in DATABASE_ENGINE:
+    DATABASE_ENGINE = 'django.db.backends.%s' % DATABASE_ENGINE
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'ENGINE': DATABASE_ENGINE,
+        # Keep connections open between requests (per worker thread) and
+        # check them before reuse instead of reconnecting every request.
+        'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+if DATABASE_ENGINE == 'django.db.backends.sqlite3':
+    DATABASES['default']['NAME'] = os.environ.get('DATABASE_NAME', BASE_DIR / 'db.sqlite3')
+    DATABASES['default']['OPTIONS'] = {
+        # Seconds a writer waits for the lock before "database is locked".
+        'timeout': float(os.environ.get('DATABASE_TIMEOUT', 20)),
     }
+    import django
+    if django.VERSION >= (5, 1):
+        # Take the write lock when a transaction starts. A deferred
+        # transaction that reads first (checkout does) cannot wait for the
+        # lock later and fails straight away instead.
+        DATABASES['default']['OPTIONS']['transaction_mode'] = 'IMMEDIATE'
+else:
+    DATABASES['default'].update({
+        'NAME': os.environ.get('DATABASE_NAME', 'littlelemon'),
+        'USER': os.environ.get('DATABASE_USER', ''),
+        'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+        'HOST': os.environ.get('DATABASE_HOST', ''),
+        'PORT': os.environ.get('DATABASE_PORT', ''),
+    })
+
+# Applied to every new SQLite connection (see LittleLemonAPI/signals.py).
+# WAL lets readers run alongside the single writer, and synchronous=NORMAL is
+# safe in WAL mode while only syncing at checkpoints. journal_mode is stored
+# in the database file, so the first connection (any manage.py command)
+# converts db.sqlite3 to WAL for good; the -wal/-shm files it keeps next to
+# it are ignored by git.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+# The catalog alias holds pre-rendered menu/category responses and the
+# version counter that writes bump. It has to be shared by every worker, or
+# the others keep serving the old menu: by default a directory that all
+# workers on this host use. Use memcached/redis when running on several hosts.
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', 10 * 60))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': os.environ.get('CATALOG_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('CATALOG_CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'littlelemon-catalog')),
+        'TIMEOUT': CATALOG_CACHE_TIMEOUT,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
 }
 
+CATALOG_CACHE_ALIAS = 'catalog'
+
+# Seconds to keep each user's group names in the default cache across
+# requests. Off by default: membership changes only invalidate the cache of
+# the process that made them, so with the per-process locmem cache a user
+# removed from Manager or Delivery Crew keeps the role in other workers until
+# the timeout. Only worth turning on with a shared default cache, or where
+# that delay is acceptable. Roles are always resolved once per request.
+ROLE_CACHE_TIMEOUT = int(os.environ.get('ROLE_CACHE_TIMEOUT', 0))
+
+# Seconds the JWT/token authenticators remember which user a token belongs
+# to (never past the token's expiry), in an LRU of AUTH_CACHE_SIZE entries
+# per process. Saving or deleting the user, or deleting the token, drops the
+# entries of this process; other processes catch up within the timeout.
+AUTH_CACHE_TIMEOUT = 60
+AUTH_CACHE_SIZE = 10000
+
+# Order events for the delivery crew stream (/api/delivery-crew/orders/events).
+# LocalBroker only reaches streams served by the same process; use a shared
+# broker when running several ASGI workers. Idle streams get a comment line
+# every ORDER_EVENTS_KEEPALIVE seconds.
+ORDER_EVENTS_BACKEND = os.environ.get('ORDER_EVENTS_BACKEND', 'LittleLemonAPI.events.LocalBroker')
+ORDER_EVENTS_KEEPALIVE = 15
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -131,26 +238,53 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES' : [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'LittleLemonAPI.authentication.CachedJWTAuthentication',
+        'LittleLemonAPI.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
         # 'rest_framework.permissions.AllowAny',  # Allow any access for testing purposes
     ],
+    # orjson-backed when it is installed, DRF's json otherwise; same output.
+    'DEFAULT_RENDERER_CLASSES': [
+        'LittleLemonAPI.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'LittleLemonAPI.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.OrderingFilter',
     ],
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',
+        'LittleLemonAPI.throttling.AnonRateThrottle',
+        'LittleLemonAPI.throttling.UserRateThrottle',
     ],
     
+    # 'menu' and 'checkout' are view scopes (throttle_scope), counted
+    # separately from 'user'.
     'DEFAULT_THROTTLE_RATES': {
          'anon': '2/minute',
-        'user': '10/minute',}
+        'user': '10/minute',
+        'menu': '60/minute',
+        'checkout': '10/minute',}
+    }
+
+# Where the throttles keep their counters: by default a small SQLite file
+# (THROTTLE_DB_PATH) shared by every worker on the host, so a limit holds
+# however many processes serve it. THROTTLE_STORE=cache counts in the default
+# cache instead, which is per process unless that cache is shared.
+if os.environ.get('THROTTLE_STORE') == 'cache':
+    THROTTLE_COUNTER_STORE = {'BACKEND': 'LittleLemonAPI.throttling.CacheCounterStore'}
+else:
+    THROTTLE_COUNTER_STORE = {
+        'BACKEND': 'LittleLemonAPI.throttling.SQLiteCounterStore',
+        'OPTIONS': {'path': os.environ.get(
+            'THROTTLE_DB_PATH', os.path.join(tempfile.gettempdir(), 'littlelemon-throttle.sqlite3'))},
     }
 
 
@@ -0,0 +1,222 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.http.response import HttpResponseBase
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .authentication import aauthenticate
+from .catalog import catalog_cache
+from .events import format_event, get_broker
+from .renderers import FastJSONRenderer
+from .roles import DELIVERY_CREW, aget_group_names
+from .views import CategoryListView, DeliveryCrewOrderListView, MenuItemDetail, MenuItemList, OrderDetailView
+
+
+class ASGIRequired(exceptions.APIException):
+    status_code = status.HTTP_501_NOT_IMPLEMENTED
+    default_detail = 'This endpoint is only served by the ASGI application.'
+    default_code = 'asgi_required'
+
+
+class AsyncReadView(View):
+    # Native async GET endpoints for ASGI. Authentication and role lookups use
+    # the async ORM; querysets, filters, pagination, serializers and
+    # permissions are borrowed from the matching sync DRF view, so both
+    # versions return the same JSON. Writes stay on the sync views.
+    sync_view_class = None
+    needs_roles = False
+    catalog_cached = False
+    http_method_names = ['get']
+
+    async def dispatch(self, request, *args, **kwargs):
+        drf_request = Request(request, authenticators=[])
+        try:
+            user, auth, _ = await aauthenticate(request)
+            drf_request.user = user
+            drf_request.auth = auth
+            if self.needs_roles:
+                await aget_group_names(drf_request)
+
+            self.sync_view = self.sync_view_class(
+                request=drf_request, args=args, kwargs=kwargs, format_kwarg=None, headers={})
+            self.check_permissions(drf_request)
+            # The counter store may be a SQLite file (SQLiteCounterStore) or
+            # a network cache; either blocks, so it runs in a thread.
+            await sync_to_async(self.check_throttles)(drf_request)
+
+            if request.method.lower() not in self.http_method_names:
+                raise exceptions.MethodNotAllowed(request.method)
+            handler = getattr(self, request.method.lower())
+
+            # Same catalog cache and version as the sync views, so writes
+            # invalidate both. Cache backends are synchronous and may read
+            # files or the network, so their calls run in a thread too.
+            key = None
+            if self.catalog_cached:
+                key, entry = await sync_to_async(self.get_cached)(request)
+                if entry is not None:
+                    return catalog_cache.response(entry, request)
+
+            data = await handler(drf_request, *args, **kwargs)
+            if isinstance(data, HttpResponseBase):
+                return data
+            response = self.render(data)
+            if key is not None:
+                await sync_to_async(catalog_cache.store)(key, request, response)
+            return response
+        except exceptions.APIException as exc:
+            return self.handle_exception(request, exc)
+
+    def check_permissions(self, request):
+        for permission in self.sync_view.get_permissions():
+            if not permission.has_permission(request, self.sync_view):
+                if not request.user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+
+    def get_cached(self, request):
+        key = catalog_cache.make_key(request, catalog_cache.version())
+        return key, catalog_cache.get(key)
+
+    def check_throttles(self, request):
+        waits = [
+            throttle.wait()
+            for throttle in self.sync_view.get_throttles()
+            if not throttle.allow_request(request, self.sync_view)
+        ]
+        if waits:
+            waits = [wait for wait in waits if wait is not None]
+            raise exceptions.Throttled(max(waits, default=None))
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        renderer = FastJSONRenderer()
+        response = HttpResponse(renderer.render(data), status=status_code, content_type=renderer.media_type)
+        response['Vary'] = 'Accept'
+        return response
+
+    def handle_exception(self, request, exc):
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            authenticate_header = None
+            if api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+                authenticate_header = api_settings.DEFAULT_AUTHENTICATION_CLASSES[0]().authenticate_header(request)
+            if authenticate_header:
+                exc.auth_header = authenticate_header
+            else:
+                exc.status_code = status.HTTP_403_FORBIDDEN
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        response = self.render(data, exc.status_code)
+        if getattr(exc, 'auth_header', None):
+            response['WWW-Authenticate'] = exc.auth_header
+        if getattr(exc, 'wait', None):
+            response['Retry-After'] = '%d' % exc.wait
+        return response
+
+    async def get_object(self):
+        view = self.sync_view
+        lookup = view.lookup_url_kwarg or view.lookup_field
+        try:
+            # aget() runs the query, and any prefetch_related, off the loop.
+            # filter_queryset() as in GenericAPIView.get_object(); it is also
+            # where the fast serializers shape the queryset.
+            queryset = view.filter_queryset(view.get_queryset())
+            return await queryset.aget(**{view.lookup_field: view.kwargs[lookup]})
+        except ObjectDoesNotExist:
+            raise exceptions.NotFound()
+
+    async def list_all(self, queryset):
+        return [obj async for obj in queryset.aiterator(chunk_size=2000)]
+
+
+class AsyncMenuItemList(AsyncReadView):
+    sync_view_class = MenuItemList
+    catalog_cached = True
+
+    async def get(self, request):
+        view = self.sync_view
+        queryset = view.filter_queryset(view.get_queryset())
+        paginator = view.paginator
+        page = paginator.get_page_queryset(queryset, request, view)
+        rows = paginator.set_page([obj async for obj in page])
+        return paginator.get_paginated_response(view.get_serializer(rows, many=True).data).data
+
+
+class AsyncMenuItemDetail(AsyncReadView):
+    sync_view_class = MenuItemDetail
+    catalog_cached = True
+
+    async def get(self, request, pk):
+        return self.sync_view.get_serializer(await self.get_object()).data
+
+
+class AsyncCategoryListView(AsyncReadView):
+    sync_view_class = CategoryListView
+    catalog_cached = True
+
+    async def get(self, request):
+        view = self.sync_view
+        rows = await self.list_all(view.filter_queryset(view.get_queryset()))
+        return view.get_serializer(rows, many=True).data
+
+
+class AsyncDeliveryCrewOrderListView(AsyncReadView):
+    sync_view_class = DeliveryCrewOrderListView
+
+    async def get(self, request):
+        view = self.sync_view
+        # aiterator() with a chunk_size runs prefetch_related per chunk.
+        rows = await self.list_all(view.filter_queryset(view.get_queryset()))
+        return view.get_serializer(rows, many=True).data
+
+
+class AsyncOrderDetailView(AsyncReadView):
+    sync_view_class = OrderDetailView
+    needs_roles = True
+
+    async def get(self, request, pk):
+        return self.sync_view.get_serializer(await self.get_object()).data
+
+
+class AsyncOrderEventStream(AsyncReadView):
+    # Server-sent events for the signed-in delivery crew member: 'assigned',
+    # 'unassigned' and 'status' for their orders, published by the Order
+    # signals through events.get_broker(). An idle stream is a suspended
+    # coroutine and an empty queue; it holds no thread or database connection.
+    # WSGI would have to buffer the never-ending body, so it is ASGI only.
+    sync_view_class = DeliveryCrewOrderListView
+    needs_roles = True
+
+    async def get(self, request):
+        if not isinstance(request._request, ASGIRequest):
+            raise ASGIRequired()
+        if DELIVERY_CREW not in await aget_group_names(request):
+            raise exceptions.PermissionDenied()
+        response = StreamingHttpResponse(self.stream(request.user.pk), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stops nginx from buffering the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, user_id):
+        broker = get_broker()
+        keepalive = getattr(settings, 'ORDER_EVENTS_KEEPALIVE', 15)
+        queue = broker.subscribe(user_id)
+        try:
+            # Sent once subscribed; events published from here on are delivered.
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection.
+                    yield ': keep-alive\n\n'
+                    continue
+                yield format_event(event)
+        finally:
+            broker.unsubscribe(user_id, queue)
@@ -0,0 +1,134 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser, User
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import SessionAuthentication, TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .usercache import jwt_cache_key, token_cache_key, user_cache
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        cache_key = jwt_cache_key(raw_token)
+        cached = user_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        validated_token = self.get_validated_token(raw_token)
+        user = self.get_user(validated_token)
+        user_cache.set(cache_key, user, validated_token, validated_token.get('exp'))
+        return user, validated_token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        cached = user_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        user_cache.set(cache_key, user, token)
+        return user, token
+
+
+async def aauthenticate(request):
+    # Async counterpart of Request._authenticate() for the configured
+    # DEFAULT_AUTHENTICATION_CLASSES. Header parsing and token validation are
+    # plain CPU work; only the user lookups go through the async ORM.
+    # Returns (user, auth, authenticator) like DRF, with an anonymous user
+    # when nothing matched.
+    force_user = getattr(request, '_force_auth_user', None)
+    if force_user is not None:
+        return force_user, getattr(request, '_force_auth_token', None), None
+
+    for authenticator in [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]:
+        if isinstance(authenticator, JWTAuthentication):
+            result = await _authenticate_jwt(authenticator, request)
+        elif isinstance(authenticator, TokenAuthentication):
+            result = await _authenticate_token(authenticator, request)
+        elif isinstance(authenticator, SessionAuthentication):
+            result = await _authenticate_session(request)
+        else:
+            result = await sync_to_async(authenticator.authenticate)(request)
+        if result is not None:
+            return result[0], result[1], authenticator
+    return AnonymousUser(), None, None
+
+
+async def _authenticate_jwt(authenticator, request):
+    header = authenticator.get_header(request)
+    if header is None:
+        return None
+    raw_token = authenticator.get_raw_token(header)
+    if raw_token is None:
+        return None
+    cached = isinstance(authenticator, CachedJWTAuthentication)
+    if cached:
+        result = user_cache.get(jwt_cache_key(raw_token))
+        if result is not None:
+            return result
+    validated_token = authenticator.get_validated_token(raw_token)
+
+    try:
+        user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken(_('Token contained no recognizable user identification'))
+    try:
+        user = await User.objects.aget(**{jwt_settings.USER_ID_FIELD: user_id})
+    except User.DoesNotExist:
+        raise exceptions.AuthenticationFailed(_('User not found'), code='user_not_found')
+    if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+        raise exceptions.AuthenticationFailed(_('User is inactive'), code='user_inactive')
+    if getattr(jwt_settings, 'CHECK_REVOKE_TOKEN', False):
+        from rest_framework_simplejwt.utils import get_md5_hash_password
+        if validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise exceptions.AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+    if cached:
+        user_cache.set(jwt_cache_key(raw_token), user, validated_token, validated_token.get('exp'))
+    return user, validated_token
+
+
+async def _authenticate_token(authenticator, request):
+    auth = get_authorization_header(request).split()
+    if not auth or auth[0].lower() != authenticator.keyword.lower().encode():
+        return None
+    if len(auth) != 2:
+        raise exceptions.AuthenticationFailed(_('Invalid token header.'))
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        raise exceptions.AuthenticationFailed(_('Invalid token header. Token string should not contain invalid characters.'))
+    cached = isinstance(authenticator, CachedTokenAuthentication)
+    if cached:
+        result = user_cache.get(token_cache_key(key))
+        if result is not None:
+            return result
+    try:
+        token = await Token.objects.select_related('user').aget(key=key)
+    except Token.DoesNotExist:
+        raise exceptions.AuthenticationFailed(_('Invalid token.'))
+    if not token.user.is_active:
+        raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+    if cached:
+        user_cache.set(token_cache_key(key), token.user, token)
+    return token.user, token
+
+
+async def _authenticate_session(request):
+    # Only used for safe (read) methods, so no CSRF check is needed here.
+    if not hasattr(request, 'auser'):
+        return None
+    user = await request.auser()
+    if not user or not user.is_active:
+        return None
+    return user, None
@@ -0,0 +1,48 @@
+import contextlib
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+
+@contextlib.contextmanager
+def isolated_database(name=None):
+    # Benchmarks seed and mutate data freely, so they run against a throwaway
+    # copy of the schema rather than the configured database.
+    old_name = connection.settings_dict['NAME']
+    if name is not None:
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = name
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield connection.settings_dict['NAME']
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def bench_settings(**overrides):
+    # Throttle counters go to the default cache; a dummy cache never
+    # remembers a request, so nothing is ever throttled.
+    caches = dict(settings.CACHES)
+    caches['default'] = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    overrides.setdefault('CACHES', caches)
+    overrides.setdefault('THROTTLE_COUNTER_STORE', {'BACKEND': 'LittleLemonAPI.throttling.CacheCounterStore'})
+    overrides.setdefault('ALLOWED_HOSTS', ['testserver'])
+    return override_settings(**overrides)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def measure(func, *args, **kwargs):
+    # Returns (result, seconds, queries) for a single call.
+    with CaptureQueriesContext(connection) as context:
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+    return result, elapsed, len(context)
@@ -0,0 +1,86 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import Group, User
+from django.utils import timezone
+
+from LittleLemonAPI import rollup, search
+from LittleLemonAPI.models import Cart, Category, MenuItem, Order, OrderItem
+from LittleLemonAPI.roles import DELIVERY_CREW, MANAGER
+
+STYLES = ['Grilled', 'Roasted', 'Spicy', 'Smoked', 'Lemon', 'Garlic', 'Crispy', 'Braised', 'Stuffed', 'Herbed']
+DISHES = ['Chicken', 'Salmon', 'Falafel', 'Hummus', 'Lamb', 'Salad', 'Risotto', 'Bruschetta', 'Souvlaki', 'Baklava']
+
+
+def seed(categories=10, menu_items=200, users=50, carts=20, orders=500, lines_per_order=3,
+         delivery_crew=5, seed_value=0):
+    # Synthetic dataset for benchmarks. Everything is inserted with
+    # bulk_create, so seeding tens of thousands of rows takes seconds.
+    rng = random.Random(seed_value)
+    manager_group = Group.objects.get_or_create(name=MANAGER)[0]
+    crew_group = Group.objects.get_or_create(name=DELIVERY_CREW)[0]
+
+    manager = User.objects.create(username='bench-manager', is_staff=True)
+    manager_group.user_set.add(manager)
+    crew = User.objects.bulk_create([User(username='bench-crew-%d' % i) for i in range(max(1, delivery_crew))])
+    crew_group.user_set.add(*crew)
+    customers = User.objects.bulk_create([User(username='bench-user-%d' % i) for i in range(max(1, users))])
+
+    category_rows = Category.objects.bulk_create([
+        Category(slug='category-%d' % i, title='Category %d' % i) for i in range(max(1, categories))
+    ])
+    items = MenuItem.objects.bulk_create([
+        MenuItem(
+            title='%s %s %d' % (rng.choice(STYLES), rng.choice(DISHES), i),
+            price=Decimal(rng.randint(200, 4000)) / 100,
+            featured=rng.random() < 0.1,
+            category=rng.choice(category_rows),
+        )
+        for i in range(max(1, menu_items))
+    ])
+
+    cart_rows = []
+    for customer in customers[:carts]:
+        for item in rng.sample(items, min(len(items), lines_per_order)):
+            quantity = rng.randint(1, 4)
+            cart_rows.append(Cart(user=customer, menuitem=item, quantity=quantity,
+                                  unit_price=item.price, price=item.price * quantity))
+    Cart.objects.bulk_create(cart_rows)
+
+    now = timezone.now()
+    order_rows = [
+        Order(
+            user=rng.choice(customers),
+            delivery_crew=rng.choice(crew) if rng.random() < 0.8 else None,
+            status=rng.randint(0, 1),
+            date=now - timedelta(minutes=rng.randint(0, 60 * 24 * 90)),
+        )
+        for _ in range(orders)
+    ]
+    Order.objects.bulk_create(order_rows)
+
+    order_items = []
+    for order in order_rows:
+        total = Decimal('0.00')
+        for item in rng.sample(items, min(len(items), lines_per_order)):
+            quantity = rng.randint(1, 3)
+            order_items.append(OrderItem(order=order, menuitem=item, quantity=quantity,
+                                         unit_price=item.price, price=item.price * quantity))
+            total += item.price * quantity
+        order.total = total
+    OrderItem.objects.bulk_create(order_items, batch_size=5000)
+    Order.objects.bulk_update(order_rows, ['total'], batch_size=5000)
+    # bulk_create skips checkout and signals, so fill the sales rollups and
+    # the menu search index in one go.
+    rollup.rebuild()
+    search.rebuild()
+
+    return {
+        'manager': manager,
+        'crew': crew,
+        'customers': customers,
+        'categories': category_rows,
+        'menu_items': items,
+        'orders': order_rows,
+    }
@@ -0,0 +1,80 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+
+# What a fresh worker does before it can answer its first request:
+# django.setup(), building the WSGI handler (the middleware chain) and
+# loading the URLconf. Run in a new interpreter under -X importtime.
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+after_setup = sorted(sys.modules)
+from django.core.handlers.wsgi import WSGIHandler
+WSGIHandler()
+handler = time.perf_counter()
+from django.urls import resolve
+resolve('/api/menu-items')
+end = time.perf_counter()
+print(json.dumps({
+    'setup': setup - start, 'handler': handler - setup, 'urls': end - handler,
+    'after_setup': after_setup, 'modules': len(sys.modules),
+}))
+'''
+
+# Summed self time of the project's own modules (LittleLemon and
+# LittleLemonAPI) in the probe, so dependencies don't count against it;
+# about 40 ms at the time of writing. Checked by bench_startup --check only,
+# as it depends on the machine's load. The module count and DEFERRED_MODULES
+# don't, and the test suite checks them.
+APP_IMPORT_BUDGET_MS = 100
+MODULE_BUDGET = 1000
+
+# Left for the first request to import: management commands and anything
+# else that only calls django.setup() never pay for them.
+DEFERRED_MODULES = (
+    'LittleLemonAPI.views',
+    'LittleLemonAPI.authentication',
+    'rest_framework_simplejwt.authentication',
+    'rest_framework_simplejwt.tokens',
+    'jwt',
+    'djoser.views',
+    'rest_framework.views',
+    'LittleLemonAPI.serializers',
+)
+
+
+def parse_importtime(output):
+    # {module: (self us, cumulative us)} from -X importtime's stderr.
+    imports = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative, name = line[len('import time:'):].split('|')
+        if self_us.strip().isdigit():
+            imports[name.strip()] = (int(self_us), int(cumulative))
+    return imports
+
+
+def app_import_ms(imports):
+    return sum(
+        self_us for name, (self_us, _) in imports.items() if name.split('.')[0] in ('LittleLemon', 'LittleLemonAPI')
+    ) / 1000.0
+
+
+def run_probe():
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'LittleLemon.settings')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    probe = json.loads(result.stdout.splitlines()[-1])
+    probe['imports'] = parse_importtime(result.stderr)
+    probe['app_ms'] = app_import_ms(probe['imports'])
+    return probe
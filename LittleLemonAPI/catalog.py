@@ -0,0 +1,162 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from .compression import precompress
+from .conditional import make_etag
+
+
+class CatalogCache:
+    # Rendered menu/category responses, keyed by a catalog-wide version.
+    # Writes bump the version instead of deleting keys, so stale entries are
+    # simply never read again and expire on their own. The version and its
+    # timestamp expire with the entries: a process that doesn't see another
+    # one's bump (a per-process backend) serves the old catalog and
+    # validators for at most the timeout.
+    version_key = 'catalog:version'
+    modified_key = 'catalog:modified'
+
+    def __init__(self, alias=None, timeout=None):
+        self.alias = alias
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias or getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+    def get_timeout(self):
+        if self.timeout is not None:
+            return self.timeout
+        return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+    def version(self):
+        version = self.cache.get(self.version_key)
+        if version is None:
+            # Seed from the clock so an evicted counter can never come back
+            # with a value that older entries were stored under.
+            self.cache.add(self.version_key, time.time_ns(), self.get_timeout())
+            version = self.cache.get(self.version_key)
+        return version
+
+    def bump(self):
+        try:
+            self.cache.incr(self.version_key)
+        except ValueError:
+            self.cache.set(self.version_key, time.time_ns(), self.get_timeout())
+        self.cache.set(self.modified_key, time.time(), self.get_timeout())
+
+    def last_modified(self):
+        # Time of the last bump, for Last-Modified. If it was evicted, assume
+        # the catalog changed just now: clients refetch once, never miss a change.
+        modified = self.cache.get(self.modified_key)
+        if modified is None:
+            modified = time.time()
+            self.cache.add(self.modified_key, modified, self.get_timeout())
+        return modified
+
+    def make_key(self, request, version):
+        query = '&'.join(sorted(request.GET.urlencode().split('&')))
+        digest = hashlib.sha1(('%s?%s' % (request.path, query)).encode('utf-8')).hexdigest()
+        return 'catalog:%s:%s' % (version, digest)
+
+    def get(self, key):
+        entry = self.cache.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def set(self, key, entry):
+        self.cache.set(key, entry, self.get_timeout())
+
+    def origin(self, request):
+        return request.build_absolute_uri('/')[:-1].encode('utf-8')
+
+    def store(self, key, request, response):
+        # The body together with its compressed encodings, so that
+        # CompressionMiddleware doesn't recompress it on every hit, and the
+        # origin its pagination links were built with, if it has any.
+        content = response.content
+        origin = self.origin(request)
+        if b'"%s/' % origin not in content:
+            origin = None
+        self.set(key, (response['Content-Type'], content, precompress(content), origin))
+
+    def response(self, entry, request):
+        content_type, content, precompressed, origin = entry
+        if origin is not None:
+            current = self.origin(request)
+            if current != origin:
+                # Filled through another host name: rebuild the links for
+                # this one and let the middleware compress the new body.
+                content = content.replace(b'"%s/' % origin, b'"%s/' % current)
+                precompressed = None
+        response = HttpResponse(content, content_type=content_type)
+        response.precompressed = precompressed
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+catalog_cache = CatalogCache()
+
+
+class CatalogCacheMixin:
+    # Serves GET list/retrieve from pre-rendered JSON bytes, skipping both the
+    # ORM and the serializer. Runs after authentication, permissions and
+    # throttling, which happen in APIView.initial().
+    def get_validators(self, request):
+        # For ConditionalMixin: the catalog version changes on every write.
+        # Detail ETags carry the pk, so one item's ETag never matches another
+        # URL, such as that of an item that doesn't exist.
+        parts = ['catalog', catalog_cache.version(), request.accepted_renderer.format]
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if lookup is not None:
+            parts.append(lookup)
+            # Last-Modified is catalog-wide, so If-Modified-Since alone would
+            # say 304 for any pk; that case pays for an indexed lookup.
+            if 'HTTP_IF_NONE_MATCH' not in request.META and 'HTTP_IF_MODIFIED_SINCE' in request.META:
+                if not self.get_queryset().filter(**{self.lookup_field: lookup}).exists():
+                    return None, None
+        return make_etag(*parts), catalog_cache.last_modified()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return handler(request, *args, **kwargs)
+
+        # Read the version before touching the database: if a write lands
+        # mid-request the entry is stored under the old version and ignored.
+        key = catalog_cache.make_key(request, catalog_cache.version())
+        entry = catalog_cache.get(key)
+        if entry is not None:
+            response = catalog_cache.response(entry, request)
+            response['Allow'] = ', '.join(self.allowed_methods)
+            response['Vary'] = 'Accept'
+            return response
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.add_post_render_callback(lambda rendered: catalog_cache.store(key, request, rendered))
+        return response
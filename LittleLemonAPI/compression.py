@@ -0,0 +1,124 @@
+import gzip
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/x-ndjson', 'application/javascript')
+
+
+def encodings():
+    # In order of preference.
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 4))
+    # mtime=0 keeps the output identical for identical bodies.
+    return gzip.compress(content, compresslevel=getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6), mtime=0)
+
+
+def min_size():
+    return getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+
+
+def precompress(content):
+    # {encoding: bytes} for every encoding worth serving, computed once when a
+    # response is cached (see CatalogCache.store).
+    if len(content) < min_size():
+        return {}
+    compressed = {}
+    for encoding in encodings():
+        body = compress(content, encoding)
+        if len(body) < len(content):
+            compressed[encoding] = body
+    return compressed
+
+
+def parse_accept_encoding(header):
+    # {coding: q} from an Accept-Encoding header.
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate(request):
+    accepted = parse_accept_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    best = None
+    for encoding in encodings():
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (encoding, q)
+    return best[0] if best is not None else None
+
+
+class CompressionMiddleware:
+    # gzip, or brotli when the brotli package is installed, for bodies of at
+    # least COMPRESSION_MIN_SIZE bytes; smaller ones cost more CPU than they
+    # save on the wire. Responses may carry `precompressed`, a dict of
+    # already compressed bodies by encoding (catalog cache hits do), which is
+    # used as is. Streaming responses pass through, so server-sent events
+    # are never buffered. Like Django's GZipMiddleware, strong ETags become
+    # weak once the body is compressed.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES) or len(response.content) < min_size():
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(request)
+        if encoding is None:
+            return response
+        precompressed = getattr(response, 'precompressed', None)
+        if precompressed is not None:
+            content = precompressed.get(encoding)
+            if content is None:
+                # Not worth compressing (see precompress).
+                return response
+        else:
+            content = compress(response.content, encoding)
+            if len(content) >= len(response.content):
+                return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
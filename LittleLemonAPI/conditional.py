@@ -0,0 +1,40 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    return '"%s"' % hashlib.sha1(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+class ConditionalMixin:
+    # ETag / Last-Modified on GET list/retrieve. The view's
+    # get_validators(request) returns (etag, last_modified timestamp), either
+    # may be None, and must be cheap (a cache read or a one-column lookup): a
+    # matching If-None-Match or If-Modified-Since gets a 304 before any rows
+    # are loaded or serialized. Runs after authentication, permissions and
+    # throttling, so it goes before CatalogCacheMixin in the bases.
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        if last_modified is not None:
+            last_modified = int(last_modified)
+        response = None
+        if etag is not None or last_modified is not None:
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        if etag is not None:
+            response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ['Accept'])
+        return response
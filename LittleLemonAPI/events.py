@@ -0,0 +1,100 @@
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class LocalBroker:
+    # In-process pub/sub of order events, keyed by delivery crew user id.
+    # Subscribers are asyncio queues on the ASGI event loop; publish() may be
+    # called from any thread (signal handlers run in the sync worker threads).
+    # Only reaches subscribers in this process: with several ASGI workers,
+    # point ORDER_EVENTS_BACKEND at a broker with the same three methods on
+    # top of something shared (Redis pub/sub, Postgres LISTEN/NOTIFY, ...).
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id, set())
+            subscribers.difference_update([s for s in subscribers if s[1] is queue])
+            if not subscribers:
+                self._subscribers.pop(user_id, None)
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(offer, queue, event)
+            except RuntimeError:
+                # The subscriber's loop has closed.
+                self.unsubscribe(user_id, queue)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+def offer(queue, event):
+    # A client that stopped reading loses its oldest events, never blocks
+    # the publisher.
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                backend = getattr(settings, 'ORDER_EVENTS_BACKEND', 'LittleLemonAPI.events.LocalBroker')
+                _broker = import_string(backend)()
+    return _broker
+
+
+def order_event(kind, order):
+    return {
+        'event': kind,
+        'order': order.pk,
+        'status': order.status,
+        'delivery_crew': order.delivery_crew_id,
+    }
+
+
+def assignment_events(order, old_crew, old_status):
+    # (user_id, event) pairs for a change of an order's crew or status.
+    events = []
+    if old_crew != order.delivery_crew_id:
+        if old_crew is not None:
+            events.append((old_crew, order_event('unassigned', order)))
+        if order.delivery_crew_id is not None:
+            events.append((order.delivery_crew_id, order_event('assigned', order)))
+    elif order.delivery_crew_id is not None and old_status != order.status:
+        events.append((order.delivery_crew_id, order_event('status', order)))
+    return events
+
+
+def publish(events):
+    broker = get_broker()
+    for user_id, event in events:
+        broker.publish(user_id, event)
+
+
+def format_event(event):
+    return 'event: %s\ndata: %s\n\n' % (event['event'], json.dumps(event, separators=(',', ':')))
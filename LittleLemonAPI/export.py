@@ -0,0 +1,159 @@
+import csv
+import datetime
+import json
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .fast_serializers import format_datetime
+from .models import Order, OrderItem
+
+ORDER_FIELDS = ['id', 'user_id', 'delivery_crew_id', 'status', 'total', 'date']
+ITEM_FIELDS = ['id', 'menuitem_id', 'menuitem__title', 'quantity', 'unit_price', 'price']
+CSV_HEADER = [
+    'order_id', 'user_id', 'delivery_crew_id', 'status', 'total', 'date',
+    'item_id', 'menuitem_id', 'menuitem_title', 'quantity', 'unit_price', 'price',
+]
+
+
+def filter_orders(params):
+    # ?date_from / ?date_to take a date (whole day, inclusive) or a datetime;
+    # ?status takes one of the Order.status choices.
+    queryset = Order.objects.all()
+    date_from = parse_bound(params, 'date_from')
+    if date_from is not None:
+        queryset = queryset.filter(date__gte=date_from)
+    date_to = parse_bound(params, 'date_to', end_of_day=True)
+    if date_to is not None:
+        queryset = queryset.filter(date__lt=date_to)
+    status = params.get('status')
+    if status is not None:
+        choices = [str(value) for value, _ in Order._meta.get_field('status').choices]
+        if status not in choices:
+            raise ValidationError({'status': 'Must be one of %s.' % ', '.join(choices)})
+        queryset = queryset.filter(status=int(status))
+    return queryset
+
+
+def parse_bound(params, name, end_of_day=False):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is not None:
+        # A bare date covers the whole day.
+        if end_of_day:
+            day += datetime.timedelta(days=1)
+        parsed = datetime.datetime.combine(day, datetime.time.min)
+    else:
+        try:
+            parsed = parse_datetime(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError({name: 'Expected a date (YYYY-MM-DD) or an ISO 8601 datetime.'})
+        if end_of_day:
+            parsed += datetime.timedelta(microseconds=1)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def iter_orders(queryset, batch_size=500):
+    # Walks the orders by primary key in fixed-size batches: one query for the
+    # orders and one for their items per batch, and nothing is kept between
+    # batches, so memory stays flat however long the history is.
+    last_id = 0
+    while True:
+        orders = list(queryset.filter(id__gt=last_id).order_by('id').values(*ORDER_FIELDS)[:batch_size])
+        if not orders:
+            return
+        items = {}
+        rows = (
+            OrderItem.objects.filter(order_id__in=[order['id'] for order in orders])
+            .order_by('order_id', 'id')
+            .values('order_id', *ITEM_FIELDS)
+        )
+        for row in rows:
+            items.setdefault(row.pop('order_id'), []).append(row)
+        for order in orders:
+            yield order, items.get(order['id'], [])
+        if len(orders) < batch_size:
+            return
+        last_id = orders[-1]['id']
+
+
+def ndjson_lines(orders):
+    for order, items in orders:
+        record = {
+            'id': order['id'],
+            'user': order['user_id'],
+            'delivery_crew': order['delivery_crew_id'],
+            'status': order['status'],
+            'total': str(order['total']) if order['total'] is not None else None,
+            'date': format_datetime(order['date']),
+            'order_items': [
+                {
+                    'id': item['id'],
+                    'menuitem_id': item['menuitem_id'],
+                    'menuitem_title': item['menuitem__title'],
+                    'quantity': item['quantity'],
+                    'unit_price': str(item['unit_price']),
+                    'price': str(item['price']),
+                }
+                for item in items
+            ],
+        }
+        yield json.dumps(record, separators=(',', ':')) + '\n'
+
+
+# Text cells a spreadsheet would run as a formula.
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def csv_cell(value):
+    # Menu item titles are free text; a leading ' keeps them text when the
+    # file is opened in a spreadsheet. Numbers are written as they are.
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def csv_lines(orders):
+    # One row per order item; an order without items still gets one row.
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for order, items in orders:
+        head = [
+            order['id'], order['user_id'], order['delivery_crew_id'], order['status'],
+            order['total'], format_datetime(order['date']),
+        ]
+        if not items:
+            yield writer.writerow(head + [''] * len(ITEM_FIELDS))
+        for item in items:
+            yield writer.writerow(head + [csv_cell(item[field]) for field in ITEM_FIELDS])
+
+
+def buffered(lines, size=16384):
+    # Groups small lines into chunks of about `size` bytes, so the server does
+    # one write per chunk instead of one per line.
+    chunk = []
+    length = 0
+    for line in lines:
+        chunk.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(chunk)
+            chunk = []
+            length = 0
+    if chunk:
+        yield ''.join(chunk)
@@ -0,0 +1,293 @@
+from decimal import Decimal
+
+from django.db.models import Prefetch
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import OrderItem
+
+# Read-only serializers for the hot GET endpoints. They build the output dicts
+# directly instead of going through DRF's per-field to_representation(), and
+# must render byte-for-byte the same JSON as the ModelSerializers in
+# serializers.py (see FastSerializerParityTests).
+
+CENTS = Decimal('0.01')
+
+
+def money(value):
+    # DRF's DecimalField(decimal_places=2) with COERCE_DECIMAL_TO_STRING.
+    if value is None:
+        return None
+    return '{:f}'.format(value.quantize(CENTS))
+
+
+def format_datetime(value):
+    # Same representation as DRF's DateTimeField.
+    value = timezone.localtime(value).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def split_param(value):
+    return [name for name in (part.strip() for part in value.split(',')) if name]
+
+
+def unique(names):
+    return list(dict.fromkeys(names))
+
+
+class FieldSelection:
+    # A GET's ?fields= and ?expand=. `fields` are the top-level fields to
+    # render, in the serializer's order. `expand` holds the dotted paths of
+    # the relations to embed; any other relation is rendered as its primary
+    # key(s), and expanding a path expands its parents too. Leaving out
+    # ?fields= (or passing it empty) keeps every field, and leaving out
+    # ?expand= embeds every relation, so ?expand= alone is the opt-out.
+    def __init__(self, fields, expand):
+        self.fields = fields
+        self.expand = expand
+
+    def expands(self, path):
+        return path in self.expand
+
+    @classmethod
+    def from_query(cls, query_params, serializer_class):
+        # None when the request asks for neither: the full representation.
+        fields = query_params.get('fields')
+        expand = query_params.get('expand')
+        if fields is None and expand is None:
+            return None
+        errors = {}
+        requested = split_param(fields or '')
+        unknown = [name for name in requested if name not in serializer_class.fields]
+        if unknown:
+            errors['fields'] = ['Unknown field(s): %s. Choose from: %s.' % (
+                ', '.join(unknown), ', '.join(serializer_class.fields))]
+        fields = [name for name in serializer_class.fields if not requested or name in requested]
+        if expand is None:
+            paths = set(serializer_class.expandable)
+        else:
+            requested = split_param(expand)
+            unknown = [path for path in requested if path not in serializer_class.expandable]
+            if unknown:
+                errors['expand'] = ['Unknown relation(s): %s. Choose from: %s.' % (
+                    ', '.join(unknown), ', '.join(serializer_class.expandable))]
+            paths = set()
+            for path in requested:
+                parts = path.split('.')
+                paths.update('.'.join(parts[:i]) for i in range(1, len(parts) + 1))
+        if errors:
+            raise ValidationError(errors)
+        return cls(fields, paths)
+
+
+class FastSerializer:
+    # Just enough of the serializer interface for the generic views'
+    # list()/retrieve(): get_serializer(instance, many=...).data. `fields`
+    # and `expandable` are what ?fields= and ?expand= may name.
+    fields = ()
+    expandable = ()
+
+    def __init__(self, instance=None, many=False, selection=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.selection = selection
+
+    @classmethod
+    def prepare(cls, queryset, selection=None, keep=()):
+        # Lets a fast serializer pick a cheaper row shape for its queryset,
+        # loading only what `selection` renders plus the `keep` columns
+        # (the paginator's sort key).
+        return queryset
+
+    @property
+    def data(self):
+        if self.many:
+            return [self.to_representation(row) for row in self.instance]
+        return self.to_representation(self.instance)
+
+    def to_representation(self, row):
+        raise NotImplementedError
+
+
+def menu_item_from_row(row):
+    return {
+        'id': row.id,
+        'title': row.title,
+        'price': money(row.price),
+        'featured': row.featured,
+        'category': {'id': row.category_id, 'slug': row.category__slug, 'title': row.category__title},
+    }
+
+
+def menu_item_fields(row, fields, category):
+    # A rows() tuple holding only the columns of `fields`.
+    data = {}
+    for name in fields:
+        if name == 'price':
+            data[name] = money(row.price)
+        elif name == 'category':
+            if category:
+                data[name] = {'id': row.category_id, 'slug': row.category__slug, 'title': row.category__title}
+            else:
+                data[name] = row.category_id
+        else:
+            data[name] = getattr(row, name)
+    return data
+
+
+def menu_item_from_instance(item, category=True):
+    if category:
+        category = item.category
+        category = {'id': category.id, 'slug': category.slug, 'title': category.title}
+    else:
+        category = item.category_id
+    return {
+        'id': item.id,
+        'title': item.title,
+        'price': money(item.price),
+        'featured': item.featured,
+        'category': category,
+    }
+
+
+class FastMenuItemSerializer(FastSerializer):
+    # Takes MenuItemQuerySet.rows() named tuples, so there is no model
+    # instance per row either, or model instances with their category.
+    fields = ('id', 'title', 'price', 'featured', 'category')
+    expandable = ('category',)
+
+    @classmethod
+    def prepare(cls, queryset, selection=None, keep=()):
+        if selection is None:
+            return queryset.rows()
+        columns = []
+        for name in selection.fields:
+            if name == 'category':
+                columns.append('category_id')
+                if selection.expands('category'):
+                    columns += ['category__slug', 'category__title']
+            else:
+                columns.append(name)
+        return queryset.rows(*unique(columns + list(keep)))
+
+    def to_representation(self, row):
+        if self.selection is not None:
+            return menu_item_fields(row, self.selection.fields, self.selection.expands('category'))
+        if hasattr(row, 'category__slug'):
+            return menu_item_from_row(row)
+        return menu_item_from_instance(row)
+
+
+def order_item(item, menuitem=True, category=True):
+    return {
+        'id': item.id,
+        'order': item.order_id,
+        'menuitem': menu_item_from_instance(item.menuitem, category) if menuitem else item.menuitem_id,
+        'quantity': item.quantity,
+        'unit_price': money(item.unit_price),
+        'price': money(item.price),
+    }
+
+
+def order_items_queryset(selection):
+    # The prefetch for ?expand=: nothing past what gets rendered.
+    items = OrderItem.objects.all()
+    if not selection.expands('order_items'):
+        return items.only('id', 'order')
+    if selection.expands('order_items.menuitem.category'):
+        return items.select_related('menuitem__category').defer('menuitem__updated_at', 'menuitem__category__updated_at')
+    if selection.expands('order_items.menuitem'):
+        return items.select_related('menuitem').defer('menuitem__updated_at')
+    return items
+
+
+def order_fields(order, selection):
+    data = {}
+    for name in selection.fields:
+        if name == 'order_items':
+            items = order.order_items.all()
+            if selection.expands('order_items'):
+                menuitem = selection.expands('order_items.menuitem')
+                category = selection.expands('order_items.menuitem.category')
+                data[name] = [order_item(item, menuitem, category) for item in items]
+            else:
+                data[name] = [item.id for item in items]
+        elif name in ('user', 'delivery_crew'):
+            data[name] = getattr(order, name + '_id')
+        elif name == 'total':
+            data[name] = money(order.total)
+        elif name == 'date':
+            data[name] = format_datetime(order.date)
+        else:
+            data[name] = getattr(order, name)
+    return data
+
+
+class FastOrderSerializer(FastSerializer):
+    # Takes orders from Order.objects.with_items(), so every item and its
+    # menu item and category are already loaded.
+    fields = ('id', 'user', 'delivery_crew', 'status', 'total', 'date', 'order_items')
+    expandable = ('order_items', 'order_items.menuitem', 'order_items.menuitem.category')
+
+    @classmethod
+    def prepare(cls, queryset, selection=None, keep=()):
+        if selection is None:
+            return queryset
+        columns = [name for name in selection.fields if name != 'order_items']
+        queryset = queryset.prefetch_related(None).only(*unique(['id'] + columns + list(keep)))
+        if 'order_items' in selection.fields:
+            queryset = queryset.prefetch_related(Prefetch('order_items', queryset=order_items_queryset(selection)))
+        return queryset
+
+    def to_representation(self, order):
+        if self.selection is not None:
+            return order_fields(order, self.selection)
+        return {
+            'id': order.id,
+            'user': order.user_id,
+            'delivery_crew': order.delivery_crew_id,
+            'status': order.status,
+            'total': money(order.total),
+            'date': format_datetime(order.date),
+            'order_items': [order_item(item) for item in order.order_items.all()],
+        }
+
+
+class FastSerializerMixin:
+    # Views set fast_serializer_class to serve GET with a FastSerializer;
+    # every other method (and the browsable API's forms) keeps
+    # serializer_class. Set it to None to switch the fast path off, and with
+    # it ?fields= and ?expand=.
+    fast_serializer_class = None
+
+    def use_fast_serializer(self):
+        return self.fast_serializer_class is not None and self.request.method in ('GET', 'HEAD')
+
+    def get_selection(self):
+        if not hasattr(self, '_selection'):
+            self._selection = FieldSelection.from_query(self.request.query_params, self.fast_serializer_class)
+        return self._selection
+
+    def get_sort_fields(self, queryset):
+        # Columns the keyset paginator builds its cursors from.
+        paginator = self.paginator
+        if paginator is None or not hasattr(paginator, 'get_ordering'):
+            return []
+        names = [name.lstrip('-') for name in paginator.get_ordering(self.request, queryset, self)]
+        return ['id' if name == 'pk' else name for name in names]
+
+    def filter_queryset(self, queryset):
+        # After the filters, and whatever get_queryset() the view defines.
+        queryset = super().filter_queryset(queryset)
+        if self.use_fast_serializer():
+            selection = self.get_selection()
+            keep = self.get_sort_fields(queryset) if selection is not None else ()
+            return self.fast_serializer_class.prepare(queryset, selection, keep)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        if self.use_fast_serializer():
+            return self.fast_serializer_class(*args, selection=self.get_selection(), **kwargs)
+        return super().get_serializer(*args, **kwargs)
@@ -0,0 +1,20 @@
+from django_filters import rest_framework as filters
+
+from .models import MenuItem
+from .search import search
+
+
+class MenuItemFilter(filters.FilterSet):
+    # ?category=<id>&featured=true&price_min=&price_max=&search=
+    category = filters.NumberFilter(field_name='category_id')
+    featured = filters.BooleanFilter()
+    price_min = filters.NumberFilter(field_name='price', lookup_expr='gte')
+    price_max = filters.NumberFilter(field_name='price', lookup_expr='lte')
+    search = filters.CharFilter(method='filter_search')
+
+    class Meta:
+        model = MenuItem
+        fields = ['category', 'featured', 'price_min', 'price_max', 'search']
+
+    def filter_search(self, queryset, name, value):
+        return search(queryset, value)
@@ -0,0 +1,301 @@
+import json
+import platform
+import time
+import tracemalloc
+from collections import namedtuple
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIClient
+
+from LittleLemonAPI import urls
+from LittleLemonAPI.benchmarks import bench_settings, isolated_database, measure, percentile
+from LittleLemonAPI.benchmarks.seed import seed
+from LittleLemonAPI.models import Cart
+
+Scenario = namedtuple('Scenario', 'label url_name method user path data setup headers')
+
+
+def scenario(label, url_name, method, user, path, data=None, setup=None, headers=None):
+    return Scenario(label, url_name, method, user, path, data, setup, headers)
+
+
+def refill_cart(ctx):
+    user = ctx['checkout_user']
+    Cart.objects.filter(user=user).delete()
+    Cart.objects.bulk_create([
+        Cart(user=user, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+        for item in ctx['menu_items'][:5]
+    ])
+
+
+def clear_cart(ctx):
+    Cart.objects.filter(user=ctx['customer']).delete()
+
+
+def next_dispatch_round(ctx):
+    # Alternates the crew member, so every batch really changes its orders.
+    ctx['dispatch_round'] = ctx.get('dispatch_round', 0) + 1
+
+
+def dispatch_batch(ctx):
+    crew = ctx['crew_members'][ctx.get('dispatch_round', 0) % len(ctx['crew_members'])]
+    return [{'order_id': order.pk, 'delivery_crew_id': crew.pk} for order in ctx['orders'][2:52]]
+
+
+def status_batch(ctx):
+    return [{'order_id': order.pk, 'status': ctx.get('dispatch_round', 0) % 2} for order in ctx['orders'][2:52]]
+
+
+def revalidate(user, path):
+    # Fetches the current ETag, so the measured request is a conditional GET
+    # that should come back 304.
+    def setup(ctx):
+        client = APIClient()
+        client.force_authenticate(ctx[user])
+        ctx['etag'] = client.get(path(ctx))['ETag']
+    return {'setup': setup, 'headers': lambda c: {'If-None-Match': c['etag']}}
+
+
+SCENARIOS = [
+    scenario('categories', 'categories', 'GET', 'customer', lambda c: '/api/categories'),
+    scenario('menu-items', 'menuitem-list', 'GET', 'customer', lambda c: '/api/menu-items'),
+    scenario('menu-items (304)', 'menuitem-list', 'GET', 'customer', lambda c: '/api/menu-items',
+             **revalidate('customer', lambda c: '/api/menu-items')),
+    scenario('menu-items?search', 'menuitem-list', 'GET', 'customer',
+             lambda c: '/api/menu-items?search=chick&price_max=30&ordering=-price'),
+    scenario('menu-items?fields', 'menuitem-list', 'GET', 'customer',
+             lambda c: '/api/menu-items?fields=id,title,price&expand='),
+    scenario('menu-items/<pk>', 'menuitem-detail', 'GET', 'customer',
+             lambda c: '/api/menu-items/%d' % c['menu_items'][0].pk),
+    scenario('add-category', 'add-category', 'POST', 'manager', lambda c: '/api/add-category',
+             data=lambda c: {'slug': 'bench', 'title': 'Bench'}),
+    scenario('update-item-of-the-day', 'update-item-of-the-day', 'POST', 'manager',
+             lambda c: '/api/update-item-of-the-day/%d' % c['menu_items'][1].pk),
+    scenario('groups/manager/users', 'list-create-manager-users', 'GET', 'manager',
+             lambda c: '/api/groups/manager/users'),
+    scenario('groups/manager/users/<id>', 'remove-manager-user', 'DELETE', 'manager',
+             lambda c: '/api/groups/manager/users/%d' % c['customer'].pk),
+    scenario('groups/delivery-crew/users', 'list-create-delivery-crew-users', 'GET', 'manager',
+             lambda c: '/api/groups/delivery-crew/users'),
+    scenario('groups/delivery-crew/users/<id>', 'remove-delivery-crew-user', 'DELETE', 'manager',
+             lambda c: '/api/groups/delivery-crew/users/%d' % c['customer'].pk),
+    scenario('cart/menu-items GET', 'cart-management', 'GET', 'customer', lambda c: '/api/cart/menu-items'),
+    scenario('cart/menu-items POST', 'cart-management', 'POST', 'customer', lambda c: '/api/cart/menu-items',
+             data=lambda c: [{'menuitem_id': item.pk, 'quantity': 2} for item in c['menu_items'][:5]]),
+    scenario('cart/menu-items POST increment', 'cart-management', 'POST', 'customer',
+             lambda c: '/api/cart/menu-items?mode=increment',
+             data=lambda c: {'menuitem_id': c['menu_items'][0].pk, 'quantity': 1}, setup=clear_cart),
+    scenario('orders (manager)', 'order-list-create', 'GET', 'manager', lambda c: '/api/orders'),
+    scenario('orders?fields (manager)', 'order-list-create', 'GET', 'manager',
+             lambda c: '/api/orders?fields=id,status,total'),
+    scenario('orders?expand= (manager)', 'order-list-create', 'GET', 'manager', lambda c: '/api/orders?expand='),
+    scenario('orders (customer)', 'order-list-create', 'GET', 'customer', lambda c: '/api/orders'),
+    scenario('orders checkout', 'order-list-create', 'POST', 'checkout_user', lambda c: '/api/orders',
+             data=lambda c: {'status': 0}, setup=refill_cart),
+    scenario('orders/export ndjson', 'order-export', 'GET', 'manager', lambda c: '/api/orders/export'),
+    scenario('orders/export csv', 'order-export', 'GET', 'manager', lambda c: '/api/orders/export?output=csv'),
+    scenario('orders/<pk>', 'order-detail', 'GET', 'customer', lambda c: '/api/orders/%d' % c['customer_order'].pk),
+    scenario('orders/<pk> (304)', 'order-detail', 'GET', 'customer', lambda c: '/api/orders/%d' % c['customer_order'].pk,
+             **revalidate('customer', lambda c: '/api/orders/%d' % c['customer_order'].pk)),
+    scenario('delivery-crew/orders', 'delivery-crew-order-list', 'GET', 'crew', lambda c: '/api/delivery-crew/orders'),
+    scenario('delivery-crew/orders?fields', 'delivery-crew-order-list', 'GET', 'crew',
+             lambda c: '/api/delivery-crew/orders?fields=id,status,date'),
+    scenario('delivery-crew/orders/<pk>', 'delivery-crew-order-update', 'PATCH', 'crew',
+             lambda c: '/api/delivery-crew/orders/%d' % c['crew_order'].pk, data=lambda c: {'status': 1}),
+    scenario('assign-order', 'assign-order', 'POST', 'manager',
+             lambda c: '/api/assign-order/%d/%d' % (c['crew_order'].pk, c['crew'].pk)),
+    scenario('update-order-status', 'update-order-status', 'POST', 'crew',
+             lambda c: '/api/update-order-status/%d' % c['crew_order'].pk),
+    scenario('assign-orders (50)', 'assign-orders', 'POST', 'manager', lambda c: '/api/assign-orders',
+             data=dispatch_batch, setup=next_dispatch_round),
+    scenario('update-orders-status (50)', 'update-orders-status', 'POST', 'manager', lambda c: '/api/update-orders-status',
+             data=status_batch, setup=next_dispatch_round),
+    scenario('reports/sales (day)', 'sales-report', 'GET', 'manager', lambda c: '/api/reports/sales'),
+    scenario('reports/sales (item)', 'sales-report', 'GET', 'manager', lambda c: '/api/reports/sales?group_by=item'),
+    scenario('metrics', 'metrics', 'GET', 'manager', lambda c: '/api/metrics'),
+    scenario('async/menu-items', 'async-menuitem-list', 'GET', 'customer', lambda c: '/api/async/menu-items'),
+    scenario('async/menu-items/<pk>', 'async-menuitem-detail', 'GET', 'customer',
+             lambda c: '/api/async/menu-items/%d' % c['menu_items'][0].pk),
+    scenario('async/categories', 'async-categories', 'GET', 'customer', lambda c: '/api/async/categories'),
+    scenario('async/delivery-crew/orders', 'async-delivery-crew-order-list', 'GET', 'crew',
+             lambda c: '/api/async/delivery-crew/orders'),
+    scenario('async/orders/<pk>', 'async-order-detail', 'GET', 'customer',
+             lambda c: '/api/async/orders/%d' % c['customer_order'].pk),
+]
+
+# Routes that can't be timed as single request/response round trips.
+UNBENCHMARKED = {
+    'delivery-crew-order-events': 'endless event stream; see bench_sse',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic dataset in a throwaway database, drive every LittleLemonAPI '
+        'route through the test client and report latency percentiles, queries per '
+        'request and peak memory. Optionally compare against a previous run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--menu-items', type=int, default=200)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--carts', type=int, default=20)
+        parser.add_argument('--orders', type=int, default=500)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--memory-samples', type=int, default=3)
+        parser.add_argument('--only', nargs='+', help='Only run scenarios whose label starts with one of these.')
+        parser.add_argument('--output', help='Write results to this JSON file.')
+        parser.add_argument('--compare', help='Previous JSON results to compare against.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed relative p95 slowdown before a regression is reported.')
+
+    def handle(self, *args, **options):
+        covered = {s.url_name for s in SCENARIOS} | set(UNBENCHMARKED)
+        missing = [p.name for p in urls.urlpatterns if p.name not in covered]
+        if missing:
+            raise CommandError('No benchmark scenario for route(s): %s' % ', '.join(missing))
+
+        scenarios = SCENARIOS
+        if options['only']:
+            scenarios = [s for s in SCENARIOS if s.label.startswith(tuple(options['only']))]
+
+        with isolated_database(), bench_settings():
+            started = time.perf_counter()
+            ctx = self.build_context(options)
+            self.stdout.write('Seeded dataset in %.1fs' % (time.perf_counter() - started))
+            results = {s.label: self.run_scenario(s, ctx, options) for s in scenarios}
+
+        report = {
+            'meta': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'dataset': {key: options[key] for key in ('categories', 'menu_items', 'users', 'carts', 'orders')},
+                'iterations': options['iterations'],
+            },
+            'endpoints': results,
+        }
+        self.print_table(results)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2, sort_keys=True)
+            self.stdout.write('Wrote %s' % options['output'])
+        if options['compare']:
+            self.compare(results, options['compare'], options['threshold'])
+
+    def build_context(self, options):
+        data = seed(
+            categories=options['categories'],
+            menu_items=options['menu_items'],
+            users=options['users'],
+            carts=options['carts'],
+            orders=options['orders'],
+        )
+        customer = data['customers'][0]
+        crew = data['crew'][0]
+        customer_order = data['orders'][0]
+        customer_order.user = customer
+        customer_order.save(update_fields=['user'])
+        crew_order = data['orders'][1]
+        crew_order.delivery_crew = crew
+        crew_order.save(update_fields=['delivery_crew'])
+        checkout_user = data['customers'][-1]
+        return dict(data, crew_members=data['crew'], customer=customer, crew=crew, customer_order=customer_order,
+                    crew_order=crew_order, checkout_user=checkout_user)
+
+    def request(self, client, s, ctx):
+        if s.setup is not None:
+            s.setup(ctx)
+        method = getattr(client, s.method.lower())
+        headers = s.headers(ctx) if s.headers else None
+        if s.method == 'GET':
+            response = method(s.path(ctx), headers=headers)
+        else:
+            response = method(s.path(ctx), s.data(ctx) if s.data else None, format='json', headers=headers)
+        # Streaming bodies are produced while they are read, so read them
+        # inside the measured call.
+        response.body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response
+
+    def run_scenario(self, s, ctx, options):
+        client = APIClient()
+        client.force_authenticate(ctx[s.user])
+
+        for _ in range(options['warmup']):
+            self.request(client, s, ctx)
+
+        timings = []
+        queries = []
+        sizes = []
+        status = None
+        for _ in range(options['iterations']):
+            if s.setup is not None:
+                s.setup(ctx)
+            response, elapsed, count = measure(self.request, client, s._replace(setup=None), ctx)
+            if response.status_code >= 400:
+                raise CommandError('%s returned %s: %s' % (s.label, response.status_code, response.body[:200]))
+            status = response.status_code
+            timings.append(elapsed * 1000)
+            queries.append(count)
+            sizes.append(len(response.body))
+
+        peaks = []
+        tracemalloc.start()
+        try:
+            for _ in range(options['memory_samples']):
+                if s.setup is not None:
+                    s.setup(ctx)
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                self.request(client, s._replace(setup=None), ctx)
+                peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'status': status,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'queries': max(queries),
+            'bytes': max(sizes),
+            'peak_kib': round(max(peaks) / 1024.0, 1) if peaks else None,
+        }
+
+    def print_table(self, results):
+        header = '%-34s %8s %8s %8s %8s %10s %10s' % ('endpoint', 'p50 ms', 'p95 ms', 'p99 ms', 'queries', 'bytes', 'peak KiB')
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for label, r in results.items():
+            self.stdout.write('%-34s %8.2f %8.2f %8.2f %8d %10d %10s' % (
+                label, r['p50_ms'], r['p95_ms'], r['p99_ms'], r['queries'], r['bytes'], r['peak_kib']))
+
+    def compare(self, results, path, threshold):
+        with open(path) as fh:
+            previous = json.load(fh)['endpoints']
+
+        regressions = []
+        self.stdout.write('')
+        self.stdout.write('%-34s %10s %10s %8s %12s' % ('endpoint', 'p95 before', 'p95 now', 'change', 'queries'))
+        for label, now in results.items():
+            before = previous.get(label)
+            if before is None:
+                self.stdout.write('%-34s %10s %10.2f %8s %12s' % (label, '-', now['p95_ms'], 'new', now['queries']))
+                continue
+            change = (now['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+            flags = []
+            if change > threshold:
+                flags.append('slower')
+            if now['queries'] > before['queries']:
+                flags.append('more queries')
+            if flags:
+                regressions.append('%s (%s)' % (label, ', '.join(flags)))
+            self.stdout.write('%-34s %10.2f %10.2f %+7.0f%% %12s %s' % (
+                label, before['p95_ms'], now['p95_ms'], change * 100,
+                '%d -> %d' % (before['queries'], now['queries']), ' '.join(flags)))
+
+        if regressions:
+            raise CommandError('Regressions against %s: %s' % (path, '; '.join(regressions)))
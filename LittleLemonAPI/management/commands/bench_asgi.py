@@ -0,0 +1,99 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from rest_framework_simplejwt.tokens import AccessToken
+
+from LittleLemonAPI.benchmarks import bench_settings, isolated_database, percentile
+from LittleLemonAPI.benchmarks.seed import seed
+
+ENDPOINTS = [
+    ('menu-items', 'customer', '/api/menu-items', '/api/async/menu-items'),
+    ('categories', 'customer', '/api/categories', '/api/async/categories'),
+    ('delivery-crew/orders', 'crew', '/api/delivery-crew/orders', '/api/async/delivery-crew/orders'),
+    ('orders/<pk>', 'customer', '/api/orders/%(order)d', '/api/async/orders/%(order)d'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare concurrent throughput of the sync read views (WSGI handler on a '
+        'thread pool) with the async ones (ASGI handler, one event loop).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400, help='Requests per endpoint and mode.')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--menu-items', type=int, default=200)
+        parser.add_argument('--orders', type=int, default=300)
+        parser.add_argument('--no-catalog-cache', action='store_true',
+                            help='Use a dummy catalog cache so every request reaches the database.')
+
+    def handle(self, *args, **options):
+        overrides = {}
+        if options['no_catalog_cache']:
+            caches = dict(settings.CACHES)
+            caches[settings.CATALOG_CACHE_ALIAS] = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+            caches['default'] = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+            overrides['CACHES'] = caches
+
+        with isolated_database(), bench_settings(**overrides):
+            data = seed(categories=10, menu_items=options['menu_items'], users=20, carts=0, orders=options['orders'])
+            customer = data['customers'][0]
+            crew = data['crew'][0]
+            order = data['orders'][0]
+            order.user = customer
+            order.delivery_crew = crew
+            order.save(update_fields=['user', 'delivery_crew'])
+            tokens = {
+                'customer': 'Bearer %s' % AccessToken.for_user(customer),
+                'crew': 'Bearer %s' % AccessToken.for_user(crew),
+            }
+
+            self.stdout.write('%-22s %-6s %10s %10s %10s' % ('endpoint', 'mode', 'req/s', 'p50 ms', 'p95 ms'))
+            for label, user, sync_path, async_path in ENDPOINTS:
+                headers = {'Authorization': tokens[user]}
+                context = {'order': order.pk}
+                for mode, runner, path in (('wsgi', self.run_sync, sync_path), ('asgi', self.run_async, async_path)):
+                    elapsed, latencies = runner(path % context, headers, options)
+                    self.stdout.write('%-22s %-6s %10.0f %10.2f %10.2f' % (
+                        label, mode, options['requests'] / elapsed,
+                        percentile(latencies, 50), percentile(latencies, 95)))
+
+    def run_sync(self, path, headers, options):
+        def call(_):
+            client = Client()
+            start = time.perf_counter()
+            response = client.get(path, headers=headers)
+            self.check_response(response, path)
+            return (time.perf_counter() - start) * 1000
+
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            start = time.perf_counter()
+            latencies = list(pool.map(call, range(options['requests'])))
+            return time.perf_counter() - start, latencies
+
+    def run_async(self, path, headers, options):
+        async def main():
+            client = AsyncClient()
+            slots = asyncio.Semaphore(options['concurrency'])
+
+            async def call():
+                async with slots:
+                    start = time.perf_counter()
+                    response = await client.get(path, headers=headers)
+                    self.check_response(response, path)
+                    return (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            latencies = await asyncio.gather(*[call() for _ in range(options['requests'])])
+            return time.perf_counter() - start, latencies
+
+        return asyncio.run(main())
+
+    def check_response(self, response, path):
+        if response.status_code != 200:
+            raise CommandError('%s returned %s: %s' % (path, response.status_code, response.content[:200]))
@@ -0,0 +1,65 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from LittleLemonAPI.authentication import CachedJWTAuthentication, CachedTokenAuthentication, user_cache
+from LittleLemonAPI.benchmarks import bench_settings, isolated_database
+
+
+class Command(BaseCommand):
+    help = (
+        'Time authentication per request for JWT and DRF token credentials, with the '
+        'in-process user cache on and off: the authenticator alone, and a whole GET '
+        '/api/categories (whose body comes from the catalog cache).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        with isolated_database(), bench_settings():
+            user = User.objects.create(username='bench')
+            credentials = [
+                ('jwt', CachedJWTAuthentication, 'Bearer %s' % AccessToken.for_user(user)),
+                ('token', CachedTokenAuthentication, 'Token %s' % Token.objects.create(user=user).key),
+            ]
+            self.stdout.write('%-8s %-14s %-6s %12s %10s' % ('auth', 'scope', 'cache', 'us/request', 'queries'))
+            for name, authenticator, header in credentials:
+                for cache_on in (False, True):
+                    with override_settings(AUTH_CACHE_TIMEOUT=60 if cache_on else 0):
+                        user_cache.clear()
+                        for scope, run in [('authenticator', self.authenticate), ('request', self.request)]:
+                            seconds, queries = run(authenticator, header, options['requests'])
+                            self.stdout.write('%-8s %-14s %-6s %12.1f %10.2f' % (
+                                name, scope, 'on' if cache_on else 'off',
+                                seconds / options['requests'] * 1e6, queries / options['requests']))
+
+    def authenticate(self, authenticator, header, count):
+        factory = APIRequestFactory()
+        requests = [factory.get('/api/categories', HTTP_AUTHORIZATION=header) for _ in range(count)]
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            for request in requests:
+                if Request(request, authenticators=[authenticator()]).user.is_anonymous:
+                    raise CommandError('%s credentials were rejected' % authenticator.__name__)
+            elapsed = time.perf_counter() - start
+        return elapsed, len(context)
+
+    def request(self, authenticator, header, count):
+        client = APIClient()
+        client.get('/api/categories', HTTP_AUTHORIZATION=header)
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            for _ in range(count):
+                response = client.get('/api/categories', HTTP_AUTHORIZATION=header)
+                if response.status_code != 200:
+                    raise CommandError('/api/categories returned %s' % response.status_code)
+            elapsed = time.perf_counter() - start
+        return elapsed, len(context)
@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+
+from LittleLemonAPI.benchmarks import bench_settings, isolated_database, measure, percentile
+from LittleLemonAPI.models import Cart, Category, MenuItem
+
+
+class Command(BaseCommand):
+    help = 'Time POST /api/orders (checkout) for carts of different sizes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 20, 200])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with isolated_database(), bench_settings():
+            category = Category.objects.create(slug='bench', title='Bench')
+            items = MenuItem.objects.bulk_create([
+                MenuItem(title='Item %d' % i, price=Decimal('4.50'), featured=False, category=category)
+                for i in range(max(options['sizes']))
+            ])
+            user = User.objects.create(username='bench-checkout')
+            client = APIClient()
+            client.force_authenticate(user)
+
+            self.stdout.write('%6s %10s %10s %10s %8s' % ('lines', 'p50 ms', 'p95 ms', 'max ms', 'queries'))
+            for size in options['sizes']:
+                samples = []
+                queries = set()
+                for _ in range(options['repeat']):
+                    Cart.objects.bulk_create([
+                        Cart(user=user, menuitem=item, quantity=2, unit_price=item.price, price=item.price * 2)
+                        for item in items[:size]
+                    ])
+                    response, elapsed, count = measure(client.post, '/api/orders', {'status': 0}, format='json')
+                    if response.status_code != 201:
+                        raise RuntimeError('checkout failed: %s %s' % (response.status_code, response.content))
+                    samples.append(elapsed * 1000)
+                    queries.add(count)
+                self.stdout.write('%6d %10.2f %10.2f %10.2f %8s' % (
+                    size, percentile(samples, 50), percentile(samples, 95), max(samples),
+                    '/'.join(str(q) for q in sorted(queries)),
+                ))
@@ -0,0 +1,93 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from LittleLemonAPI import compression
+from LittleLemonAPI.benchmarks import bench_settings, isolated_database
+from LittleLemonAPI.benchmarks.seed import seed
+from LittleLemonAPI.catalog import CatalogCache, catalog_cache
+
+PAYLOADS = [
+    ('categories', '/api/categories'),
+    ('menu-items/<pk>', None),
+    ('menu-items', '/api/menu-items'),
+    ('menu-items (200)', '/api/menu-items?page_size=200'),
+    ('orders', '/api/orders'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compress real API response bodies with gzip at several levels (and brotli at '
+        'several qualities, when it is installed) and report the CPU time per response '
+        'against the bytes saved; then time cached catalog GETs with and without their '
+        'precompressed bodies.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--menu-items', type=int, default=2000)
+        parser.add_argument('--orders', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with isolated_database(), bench_settings():
+            data = seed(menu_items=options['menu_items'], users=20, carts=0, orders=options['orders'])
+            client = APIClient()
+            client.force_authenticate(data['manager'])
+            bodies = []
+            for name, path in PAYLOADS:
+                path = path or '/api/menu-items/%d' % data['menu_items'][0].pk
+                bodies.append((name, client.get(path).content))
+
+            settings = [('gzip', level) for level in (1, 6, 9)]
+            if compression.brotli is not None:
+                settings += [('br', quality) for quality in (1, 4, 11)]
+            else:
+                self.stdout.write('brotli is not installed; gzip only')
+            self.stdout.write('%-18s %-8s %8s %8s %7s %12s %14s' % (
+                'payload', 'coding', 'bytes', 'out', 'saved', 'us/response', 'us/KiB saved'))
+            for name, body in bodies:
+                for encoding, level in settings:
+                    setting = 'COMPRESSION_GZIP_LEVEL' if encoding == 'gzip' else 'COMPRESSION_BROTLI_QUALITY'
+                    with override_settings(**{setting: level}):
+                        seconds, out = self.best(lambda: compression.compress(body, encoding), options['repeat'])
+                    saved = len(body) - len(out)
+                    self.stdout.write('%-18s %-8s %8d %8d %6.0f%% %12.1f %14s' % (
+                        name, '%s/%d' % (encoding, level), len(body), len(out), 100.0 * saved / len(body),
+                        seconds * 1e6, '%.2f' % (seconds * 1e6 / (saved / 1024.0)) if saved > 0 else '-'))
+
+            self.stdout.write('')
+            self.stdout.write('%-18s %-18s %12s' % ('cached GET', 'body', 'us/request'))
+            for name, path in [('menu-items', '/api/menu-items'), ('menu-items (200)', '/api/menu-items?page_size=200')]:
+                client.get(path)
+                for label, headers, precompressed in [
+                    ('plain', {}, True),
+                    ('gzip per request', {'accept-encoding': 'gzip'}, False),
+                    ('precompressed', {'accept-encoding': 'gzip'}, True),
+                ]:
+                    seconds = self.time_get(client, path, headers, precompressed, options['repeat'])
+                    self.stdout.write('%-18s %-18s %12.1f' % (name, label, seconds * 1e6))
+
+    def best(self, run, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            out = run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, out
+
+    def time_get(self, client, path, headers, precompressed, repeat):
+        if not precompressed:
+            # Cache hits as they were before the compressed bodies were kept.
+            def response(entry, request):
+                response = CatalogCache.response(catalog_cache, entry, request)
+                response.precompressed = None
+                return response
+            catalog_cache.response = response
+        try:
+            return self.best(lambda: client.get(path, headers=headers), repeat)[0]
+        finally:
+            catalog_cache.__dict__.pop('response', None)
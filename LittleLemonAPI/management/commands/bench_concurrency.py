@@ -0,0 +1,150 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from rest_framework.test import APIClient
+
+from LittleLemonAPI.benchmarks import bench_settings, isolated_database, percentile
+from LittleLemonAPI.models import Cart, Category, MenuItem
+
+# 'tuned' is what settings.py configures; 'default' is a plain SQLite
+# connection (rollback journal, deferred transactions, 5s busy timeout).
+PROFILES = {
+    'default': ({}, {}),
+    'tuned': (None, None),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Run parallel checkout writers (plus order-list readers) against a file-backed '
+        'SQLite database, once with plain SQLite settings and once with the configured '
+        'profile, and report throughput and "database is locked" failures.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=2)
+        parser.add_argument('--checkouts', type=int, default=25, help='Checkouts per writer.')
+        parser.add_argument('--lines', type=int, default=5, help='Cart lines per checkout.')
+        parser.add_argument('--profiles', nargs='+', choices=sorted(PROFILES), default=['default', 'tuned'])
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('bench_concurrency measures SQLite locking; the default database is %s.' % connection.vendor)
+
+        self.stdout.write('%-8s %8s %8s %10s %10s %10s %8s' % (
+            'profile', 'ok', 'failed', 'orders/s', 'p50 ms', 'p95 ms', 'reads'))
+        for name in options['profiles']:
+            ok, failures, elapsed, latencies, reads = self.run_profile(name, options)
+            self.stdout.write('%-8s %8d %8d %10.1f %10.2f %10.2f %8d' % (
+                name, ok, sum(failures.values()), ok / elapsed,
+                percentile(latencies, 50), percentile(latencies, 95), reads))
+            for message, count in failures.most_common():
+                self.stdout.write('         %d x %s' % (count, message))
+
+    def run_profile(self, name, options):
+        db_options, pragmas = PROFILES[name]
+        settings_dict = connection.settings_dict
+        saved_options = settings_dict.get('OPTIONS', {})
+        if db_options is not None:
+            # Thread connections are built from this same dict.
+            settings_dict['OPTIONS'] = db_options
+        overrides = {} if pragmas is None else {'SQLITE_PRAGMAS': pragmas}
+
+        # Failed and slow requests are counted below; don't log each one.
+        loggers = [logging.getLogger(name) for name in ('django.request', 'LittleLemonAPI.metrics')]
+        levels = [logger.level for logger in loggers]
+        for logger in loggers:
+            logger.setLevel(logging.CRITICAL)
+
+        path = os.path.join(tempfile.mkdtemp(prefix='littlelemon-bench-'), 'bench.sqlite3')
+        try:
+            with isolated_database(path), bench_settings(**overrides):
+                return self.run_writers(options)
+        finally:
+            for logger, level in zip(loggers, levels):
+                logger.setLevel(level)
+            settings_dict['OPTIONS'] = saved_options
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            os.rmdir(os.path.dirname(path))
+
+    def run_writers(self, options):
+        category = Category.objects.create(slug='bench', title='Bench')
+        items = MenuItem.objects.bulk_create([
+            MenuItem(title='Item %d' % i, price=Decimal('4.50'), featured=False, category=category)
+            for i in range(options['lines'])
+        ])
+        writers = [User.objects.create(username='writer-%d' % i) for i in range(options['writers'])]
+        reader = User.objects.create(username='reader', is_staff=True)
+        connection.close()
+
+        lock = threading.Lock()
+        failures = Counter()
+        latencies = []
+        reads = [0]
+        done = threading.Event()
+
+        def write(user):
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                for _ in range(options['checkouts']):
+                    start = time.perf_counter()
+                    try:
+                        Cart.objects.filter(user=user).delete()
+                        Cart.objects.bulk_create([
+                            Cart(user=user, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+                            for item in items
+                        ])
+                        response = client.post('/api/orders', {'status': 0}, format='json')
+                        if response.status_code != 201:
+                            raise OperationalError('HTTP %s' % response.status_code)
+                    except OperationalError as exc:
+                        with lock:
+                            failures[str(exc)] += 1
+                        continue
+                    with lock:
+                        latencies.append((time.perf_counter() - start) * 1000)
+            finally:
+                connection.close()
+
+        def read():
+            client = APIClient()
+            client.force_authenticate(reader)
+            try:
+                while not done.is_set():
+                    try:
+                        client.get('/api/orders')
+                    except OperationalError as exc:
+                        with lock:
+                            failures['reader: %s' % exc] += 1
+                        continue
+                    with lock:
+                        reads[0] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=write, args=(user,)) for user in writers]
+        readers = [threading.Thread(target=read) for _ in range(options['readers'])]
+        for thread in readers:
+            thread.start()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        done.set()
+        for thread in readers:
+            thread.join()
+        return len(latencies), failures, elapsed, latencies, reads[0]
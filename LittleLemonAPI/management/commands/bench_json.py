@@ -0,0 +1,60 @@
+import io
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from LittleLemonAPI import renderers
+from LittleLemonAPI.benchmarks import isolated_database
+from LittleLemonAPI.benchmarks.seed import seed
+from LittleLemonAPI.fast_serializers import FastMenuItemSerializer, FastOrderSerializer
+from LittleLemonAPI.models import MenuItem, Order
+
+
+class Command(BaseCommand):
+    help = (
+        'Render serialized menu items and orders to JSON with DRF\'s JSONRenderer and '
+        'with FastJSONRenderer, then parse the bodies back with both parsers, and report '
+        'MB/second. Serializer output is built once up front, so only encoding and '
+        'decoding are timed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--menu-items', type=int, default=5000)
+        parser.add_argument('--orders', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            self.stdout.write('orjson is not installed; FastJSONRenderer falls back to DRF\'s encoder')
+        with isolated_database():
+            seed(menu_items=options['menu_items'], users=20, carts=0, orders=options['orders'])
+            payloads = [
+                ('menu-items', FastMenuItemSerializer(MenuItem.objects.rows(), many=True).data),
+                ('orders', FastOrderSerializer(Order.objects.with_items(), many=True).data),
+            ]
+
+        self.stdout.write('%-12s %-8s %-6s %10s %12s' % ('payload', 'step', 'json', 'MB', 'MB/s'))
+        for name, data in payloads:
+            body = JSONRenderer().render(data)
+            if renderers.FastJSONRenderer().render(data) != body:
+                self.stderr.write('%s: renderers disagree' % name)
+            for label, renderer in [('drf', JSONRenderer()), ('fast', renderers.FastJSONRenderer())]:
+                seconds = self.best(lambda: renderer.render(data), options['repeat'])
+                self.row(name, 'render', label, body, seconds)
+            for label, parser in [('drf', JSONParser()), ('fast', renderers.FastJSONParser())]:
+                seconds = self.best(lambda: parser.parse(io.BytesIO(body)), options['repeat'])
+                self.row(name, 'parse', label, body, seconds)
+
+    def best(self, run, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def row(self, name, step, label, body, seconds):
+        self.stdout.write('%-12s %-8s %-6s %10.2f %12.1f' % (name, step, label, len(body) / 1e6, len(body) / seconds / 1e6))
@@ -0,0 +1,52 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIClient
+
+from LittleLemonAPI import search
+from LittleLemonAPI.benchmarks import bench_settings, isolated_database, measure, percentile
+from LittleLemonAPI.benchmarks.seed import seed
+
+QUERIES = ['chick', 'smoked salm', 'herbed lamb 12']
+
+
+class Command(BaseCommand):
+    help = (
+        'Time GET /api/menu-items?search= for growing catalogs, with the FTS5 index '
+        'and with the plain icontains fallback (which matches substrings, not word '
+        'prefixes, so row counts can differ).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if not search.enabled():
+            raise CommandError('The FTS5 index is only available on SQLite.')
+        # No throttling and no catalog cache, so every request runs the search.
+        dummy = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        caches = dict(settings.CACHES, default=dummy, **{settings.CATALOG_CACHE_ALIAS: dummy})
+
+        self.stdout.write('%8s %-14s %12s %12s %8s' % ('items', 'query', 'fts p50 ms', 'like p50 ms', 'fts rows'))
+        for size in options['sizes']:
+            with isolated_database(), bench_settings(CACHES=caches):
+                data = seed(menu_items=size, users=1, carts=0, orders=0)
+                client = APIClient()
+                client.force_authenticate(data['customers'][0])
+                for text in QUERIES:
+                    url = '/api/menu-items?search=%s' % text.replace(' ', '+')
+                    fts, rows = self.time(client, url, options['repeat'])
+                    with mock.patch.object(search, 'enabled', return_value=False):
+                        like, _ = self.time(client, url, options['repeat'])
+                    self.stdout.write('%8d %-14s %12.2f %12.2f %8d' % (size, text, fts, like, rows))
+
+    def time(self, client, url, repeat):
+        samples = []
+        for _ in range(repeat):
+            response, elapsed, _ = measure(client.get, url)
+            if response.status_code != 200:
+                raise CommandError('%s returned %s' % (url, response.status_code))
+            samples.append(elapsed * 1000)
+        return percentile(samples, 50), len(response.data['results'])
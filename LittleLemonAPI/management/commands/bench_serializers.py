@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from LittleLemonAPI.benchmarks import isolated_database
+from LittleLemonAPI.benchmarks.seed import seed
+from LittleLemonAPI.fast_serializers import FastMenuItemSerializer, FastOrderSerializer
+from LittleLemonAPI.models import MenuItem, Order
+from LittleLemonAPI.serializers import MenuItemSerializer, OrderSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Serialize preloaded menu items and orders with the DRF ModelSerializers and '
+        'with the fast read-only serializers, and report objects/second. Rows are '
+        'loaded once up front, so only serialization is timed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--menu-items', type=int, default=2000)
+        parser.add_argument('--orders', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            seed(menu_items=options['menu_items'], users=20, carts=0, orders=options['orders'])
+            items = list(MenuItem.objects.with_category())
+            rows = list(MenuItem.objects.rows())
+            orders = list(Order.objects.with_items())
+
+            cases = [
+                ('menu-items', 'drf', MenuItemSerializer, items),
+                ('menu-items', 'fast', FastMenuItemSerializer, items),
+                ('menu-items', 'fast rows', FastMenuItemSerializer, rows),
+                ('orders', 'drf', OrderSerializer, orders),
+                ('orders', 'fast', FastOrderSerializer, orders),
+            ]
+            self.stdout.write('%-12s %-10s %8s %12s %12s' % ('endpoint', 'serializer', 'objects', 'objects/s', 'json MB/s'))
+            for name, label, serializer_class, objects in cases:
+                per_second, mb_per_second = self.time(serializer_class, objects, options['repeat'])
+                self.stdout.write('%-12s %-10s %8d %12.0f %12.1f' % (name, label, len(objects), per_second, mb_per_second))
+
+    def time(self, serializer_class, objects, repeat):
+        renderer = JSONRenderer()
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            body = renderer.render(serializer_class(objects, many=True).data)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return len(objects) / best, len(body) / best / 1e6
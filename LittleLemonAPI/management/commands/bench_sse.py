@@ -0,0 +1,91 @@
+import asyncio
+import time
+import tracemalloc
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from LittleLemonAPI.benchmarks import bench_settings, isolated_database, percentile
+from LittleLemonAPI.events import get_broker
+from LittleLemonAPI.models import Order
+from LittleLemonAPI.roles import DELIVERY_CREW
+
+URL = '/api/delivery-crew/orders/events'
+
+
+class Command(BaseCommand):
+    help = (
+        'Open many idle delivery-crew event streams through the ASGI handler, report '
+        'the memory they hold, then assign one order per crew member and time how '
+        'long the events take to reach every stream.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=2000)
+        parser.add_argument('--crew', type=int, default=50, help='Crew members the streams are spread over.')
+
+    def handle(self, *args, **options):
+        # No keep-alive comments while measuring.
+        with isolated_database(), bench_settings(ORDER_EVENTS_KEEPALIVE=3600):
+            group = Group.objects.create(name=DELIVERY_CREW)
+            crew = [User.objects.create(username='crew-%d' % i) for i in range(options['crew'])]
+            group.user_set.add(*crew)
+            customer = User.objects.create(username='customer')
+            orders = [Order.objects.create(user=customer, status=0, total=10) for _ in crew]
+            asyncio.run(self.run(crew, orders, options['connections']))
+
+    async def run(self, crew, orders, connections):
+        client = AsyncClient()
+        tokens = {user.pk: 'Bearer %s' % AccessToken.for_user(user) for user in crew}
+        broker = get_broker()
+
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        streams = []
+        for i in range(connections):
+            user = crew[i % len(crew)]
+            response = await client.get(URL, headers={'Authorization': tokens[user.pk]})
+            if response.status_code != 200:
+                raise CommandError('%s returned %s' % (URL, response.status_code))
+            stream = response.streaming_content
+            await anext(stream)
+            streams.append(stream)
+        opened = time.perf_counter() - start
+        held = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+        self.stdout.write('opened %d streams in %.2fs; %d subscribed; %.1f KiB held per idle stream' % (
+            connections, opened, broker.subscriber_count(), held / 1024.0 / connections))
+
+        received = []
+
+        async def read(stream):
+            await anext(stream)
+            received.append(time.perf_counter())
+
+        readers = [asyncio.ensure_future(read(stream)) for stream in streams]
+        await asyncio.sleep(0)
+
+        def assign():
+            for order, user in zip(orders, crew):
+                order.delivery_crew = user
+                order.save()
+
+        start = time.perf_counter()
+        await sync_to_async(assign)()
+        published = time.perf_counter() - start
+        await asyncio.wait_for(asyncio.gather(*readers), 60)
+        latencies = [(at - start) * 1000 for at in received]
+        self.stdout.write('%d assignments saved in %.1f ms; %d events delivered, p50 %.1f ms, p100 %.1f ms' % (
+            len(orders), published * 1000, len(received), percentile(latencies, 50), max(latencies)))
+
+        # Disconnect every client, as the ASGI handler does.
+        pending = [asyncio.ensure_future(anext(stream)) for stream in streams]
+        await asyncio.sleep(0)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self.stdout.write('%d subscribed after disconnecting' % broker.subscriber_count())
@@ -0,0 +1,52 @@
+import statistics
+
+from django.core.management.base import BaseCommand, CommandError
+
+from LittleLemonAPI.benchmarks import startup
+
+
+class Command(BaseCommand):
+    help = (
+        'Start fresh interpreters under -X importtime that run django.setup(), build the '
+        'WSGI handler and resolve a URL, and report the time of each step, the modules '
+        'loaded and the slowest imports. With --check, fail when the app\'s own import time '
+        'or the module count is over budget, or django.setup() loads a module it should leave '
+        'to the first request.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument('--check', action='store_true')
+
+    def handle(self, *args, **options):
+        probes = [startup.run_probe() for _ in range(options['runs'])]
+        self.stdout.write('%-28s %10s %10s' % ('step', 'median ms', 'min ms'))
+        for label, key, scale in [
+            ('django.setup()', 'setup', 1000),
+            ('WSGI handler (middleware)', 'handler', 1000),
+            ('URLconf + resolve', 'urls', 1000),
+            ('app modules (self)', 'app_ms', 1),
+        ]:
+            values = [probe[key] * scale for probe in probes]
+            self.stdout.write('%-28s %10.1f %10.1f' % (label, statistics.median(values), min(values)))
+        self.stdout.write('%-28s %10d' % ('modules loaded', probes[-1]['modules']))
+
+        imports = probes[-1]['imports']
+        self.stdout.write('')
+        self.stdout.write('%-52s %10s %10s' % ('slowest app modules', 'self ms', 'cumul. ms'))
+        app = sorted(
+            (name for name in imports if name.split('.')[0] in ('LittleLemon', 'LittleLemonAPI')),
+            key=lambda name: -imports[name][0],
+        )
+        for name in app[:options['top']]:
+            self.stdout.write('%-52s %10.1f %10.1f' % (name, imports[name][0] / 1000.0, imports[name][1] / 1000.0))
+
+        loaded = [name for name in startup.DEFERRED_MODULES if name in probes[-1]['after_setup']]
+        app_ms = min(probe['app_ms'] for probe in probes)
+        self.stdout.write('')
+        self.stdout.write('app import budget: %.1f of %d ms; modules: %d of %d; loaded by django.setup(): %s' % (
+            app_ms, startup.APP_IMPORT_BUDGET_MS, probes[-1]['modules'], startup.MODULE_BUDGET, ', '.join(loaded) or 'none'))
+        if options['check'] and (
+                app_ms > startup.APP_IMPORT_BUDGET_MS or probes[-1]['modules'] > startup.MODULE_BUDGET or loaded):
+            raise CommandError('Startup is over budget.')
@@ -0,0 +1,99 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework import throttling as drf_throttling
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from LittleLemonAPI import throttling
+
+RATE = '1000000/hour'
+
+
+class DRFUserRateThrottle(drf_throttling.UserRateThrottle):
+    rate = RATE
+
+
+class View:
+    throttle_scope = None
+
+
+def shared_increments(path, count):
+    store = throttling.SQLiteCounterStore(path)
+    for _ in range(count):
+        store.incr('bench:shared', 0, time.time() + 60)
+
+
+class Command(BaseCommand):
+    help = (
+        'Time one throttle check (allow_request) for DRF\'s timestamp-list UserRateThrottle '
+        'and for the fixed-window UserRateThrottle on the cache and SQLite counter stores, '
+        'after a growing number of earlier requests from the same user; then check that '
+        'the SQLite store counts exactly across processes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history', type=int, nargs='+', default=[0, 100, 1000])
+        parser.add_argument('--checks', type=int, default=2000)
+        parser.add_argument('--processes', type=int, default=4)
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp(prefix='littlelemon-throttle-')
+        path = os.path.join(directory, 'throttle.sqlite3')
+        caches = dict(settings.CACHES, default={
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench-throttle'})
+        rest_framework = dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={'user': RATE})
+        stores = [
+            ('cache', {'BACKEND': 'LittleLemonAPI.throttling.CacheCounterStore'}),
+            ('sqlite', {'BACKEND': 'LittleLemonAPI.throttling.SQLiteCounterStore', 'OPTIONS': {'path': path}}),
+        ]
+        request = Request(APIRequestFactory().get('/api/menu-items'))
+        request.user = User(pk=1, username='bench')
+        try:
+            with override_settings(CACHES=caches, REST_FRAMEWORK=rest_framework):
+                self.stdout.write('%-16s %10s %12s' % ('throttle', 'history', 'us/check'))
+                for history in options['history']:
+                    self.row('drf', history, DRFUserRateThrottle, request, options['checks'])
+                    for name, store in stores:
+                        with override_settings(THROTTLE_COUNTER_STORE=store):
+                            self.row('fixed/%s' % name, history, throttling.UserRateThrottle, request, options['checks'])
+
+            per_process = 500
+            workers = [
+                multiprocessing.Process(target=shared_increments, args=(path, per_process))
+                for _ in range(options['processes'])
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            count = throttling.SQLiteCounterStore(path).incr('bench:shared', 0, time.time() + 60) - 1
+            self.stdout.write('sqlite store across %d processes: counted %d of %d increments' % (
+                options['processes'], count, per_process * options['processes']))
+        finally:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            os.rmdir(directory)
+
+    def row(self, name, history, throttle_class, request, checks):
+        # Also empties the cache store, which counts in the default cache.
+        cache.clear()
+        store = throttling.get_counter_store()
+        if isinstance(store, throttling.SQLiteCounterStore):
+            store.clear()
+        view = View()
+        for _ in range(history):
+            throttle_class().allow_request(request, view)
+        start = time.perf_counter()
+        for _ in range(checks):
+            throttle_class().allow_request(request, view)
+        elapsed = time.perf_counter() - start
+        self.stdout.write('%-16s %10d %12.1f' % (name, history, elapsed / checks * 1e6))
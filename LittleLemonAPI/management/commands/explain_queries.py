@@ -0,0 +1,110 @@
+import re
+
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from LittleLemonAPI import views
+from LittleLemonAPI.benchmarks import bench_settings, isolated_database
+from LittleLemonAPI.models import Cart, Category, MenuItem, Order, OrderItem
+from LittleLemonAPI.roles import DELIVERY_CREW, MANAGER
+
+SQLITE_TABLE_SCAN = re.compile(r'\bSCAN \S+\s*$', re.MULTILINE)
+SQLITE_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+def view_queryset(view_class, user, query='', **kwargs):
+    # Build the queryset exactly as the view would for a GET, including
+    # filter backends and the keyset page window, without executing it.
+    request = APIRequestFactory().get('/' + ('?' + query if query else ''))
+    force_authenticate(request, user=user)
+    view = view_class()
+    view.setup(request, **kwargs)
+    view.request = view.initialize_request(request, **kwargs)
+    view.format_kwarg = None
+    queryset = view.filter_queryset(view.get_queryset())
+    lookup = kwargs.get(view.lookup_url_kwarg or view.lookup_field)
+    if lookup is not None:
+        return queryset.filter(**{view.lookup_field: lookup})
+    if view.paginator is not None:
+        return view.paginator.get_page_queryset(queryset, view.request, view)
+    return queryset
+
+
+def cursor_query(view_class, obj):
+    # Query string for the page after `obj`, i.e. a seek from the middle.
+    paginator = view_class.pagination_class()
+    paginator.fields = [paginator._get_field(type(obj), name) for name in paginator.ordering]
+    paginator.base_url = '/'
+    return paginator.encode_cursor(obj, reverse=False).split('?', 1)[1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Run EXPLAIN on the queryset behind every LittleLemonAPI view and fail '
+        'if any of them has to read a whole table.'
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError('EXPLAIN parsing is only implemented for SQLite and PostgreSQL.')
+
+        with isolated_database(), bench_settings():
+            failures = []
+            for label, queryset, allow_scan in self.querysets():
+                plan = queryset.explain()
+                full_scan = self.is_full_scan(plan, queryset)
+                if full_scan and allow_scan:
+                    verdict = 'ok (small lookup table)'
+                elif full_scan:
+                    verdict = 'FULL SCAN'
+                    failures.append(label)
+                else:
+                    verdict = 'ok'
+                self.stdout.write('%s: %s' % (label, verdict))
+                if options['verbosity'] > 1 or (full_scan and not allow_scan):
+                    for line in plan.splitlines():
+                        self.stdout.write('    ' + line)
+
+        if failures:
+            raise CommandError('Full table scans in: %s' % ', '.join(failures))
+
+    def is_full_scan(self, plan, queryset):
+        if connection.vendor == 'postgresql':
+            return 'Seq Scan' in plan
+        limited = queryset.query.high_mark is not None
+        # A scan in index/rowid order under a LIMIT stops after one page; a
+        # scan that is unbounded or has to be sorted afterwards reads it all.
+        return bool(SQLITE_TABLE_SCAN.search(plan)) and (not limited or SQLITE_SORT in plan)
+
+    def querysets(self):
+        manager = User.objects.create(username='explain-manager')
+        crew = User.objects.create(username='explain-crew')
+        customer = User.objects.create(username='explain-customer')
+        Group.objects.get_or_create(name=MANAGER)[0].user_set.add(manager)
+        Group.objects.get_or_create(name=DELIVERY_CREW)[0].user_set.add(crew)
+        category = Category.objects.create(slug='explain', title='Explain')
+        item = MenuItem.objects.create(title='Explain', price=1, featured=False, category=category)
+        order = Order.objects.create(user=customer, delivery_crew=crew, status=0, total=1)
+
+        return [
+            ('menu-items', view_queryset(views.MenuItemList, customer), False),
+            ('menu-items (next page)', view_queryset(views.MenuItemList, customer, cursor_query(views.MenuItemList, item)), False),
+            ('menu-items/<pk>', view_queryset(views.MenuItemDetail, customer, pk=item.pk), False),
+            ('categories', view_queryset(views.CategoryListView, customer), True),
+            ('groups/manager/users', view_queryset(views.ListCreateManagerUsers, manager), False),
+            ('groups/delivery-crew/users', view_queryset(views.ListCreateDeliveryCrewUsers, manager), False),
+            ('cart/menu-items', view_queryset(views.CartManagementView, customer), False),
+            ('orders (manager)', view_queryset(views.OrderListCreateView, manager), False),
+            ('orders (manager, next page)', view_queryset(views.OrderListCreateView, manager, cursor_query(views.OrderListCreateView, order)), False),
+            ('orders (customer)', view_queryset(views.OrderListCreateView, customer), False),
+            ('orders/<pk>', view_queryset(views.OrderDetailView, customer, pk=order.pk), False),
+            ('order items prefetch', OrderItem.objects.filter(order_id__in=[order.pk]), False),
+            ('delivery-crew/orders', view_queryset(views.DeliveryCrewOrderListView, crew), False),
+            ('delivery-crew/orders/<pk>', view_queryset(views.DeliveryCrewOrderUpdateView, crew, pk=order.pk), False),
+            ('update-order-status', Order.objects.filter(id=order.pk, delivery_crew=crew), False),
+            ('orders by status', Order.objects.filter(status=0).order_by('-date')[:50], False),
+            ('checkout cart read', Cart.objects.filter(user=customer), False),
+        ]
+
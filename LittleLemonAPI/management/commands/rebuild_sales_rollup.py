@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from LittleLemonAPI import rollup
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily sales rollups from Order and OrderItem.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        items, days = rollup.rebuild(batch_size=options['batch_size'])
+        self.stdout.write('Rebuilt %d item rows over %d days.' % (items, days))
@@ -0,0 +1,96 @@
+import threading
+from bisect import bisect_left
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    # Cumulative buckets are only built at export time; an observation is a
+    # bisect plus three additions under the registry lock.
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, label, value):
+        series = self.series.get(label)
+        if series is None:
+            series = self.series[label] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def export(self, lines):
+        lines.append('# HELP %s %s' % (self.name, self.help_text))
+        lines.append('# TYPE %s histogram' % self.name)
+        for label, (counts, total, count) in sorted(self.series.items()):
+            view = escape(label)
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                lines.append('%s_bucket{view="%s",le="%s"} %d' % (self.name, view, format_bound(bound), cumulative))
+            lines.append('%s_bucket{view="%s",le="+Inf"} %d' % (self.name, view, count))
+            lines.append('%s_sum{view="%s"} %s' % (self.name, view, repr(float(total))))
+            lines.append('%s_count{view="%s"} %d' % (self.name, view, count))
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.request_seconds = Histogram(
+            'littlelemon_request_seconds', 'Wall time per request.', SECONDS_BUCKETS)
+        self.db_seconds = Histogram(
+            'littlelemon_db_seconds', 'Time spent executing SQL per request.', SECONDS_BUCKETS)
+        self.db_queries = Histogram(
+            'littlelemon_db_queries', 'SQL statements executed per request.', QUERY_BUCKETS)
+        self.serialize_seconds = Histogram(
+            'littlelemon_serialize_seconds',
+            'Time in the view outside SQL (mostly DRF serialization) per request.', SECONDS_BUCKETS)
+        self.render_seconds = Histogram(
+            'littlelemon_render_seconds', 'Time rendering the response body per request.', SECONDS_BUCKETS)
+        self.response_bytes = Histogram(
+            'littlelemon_response_bytes', 'Response body size.', BYTES_BUCKETS)
+        self.histograms = [
+            self.request_seconds, self.db_seconds, self.db_queries,
+            self.serialize_seconds, self.render_seconds, self.response_bytes,
+        ]
+
+    def record(self, view, wall, db_time, db_queries, serialize, render, size):
+        with self.lock:
+            self.request_seconds.observe(view, wall)
+            self.db_seconds.observe(view, db_time)
+            self.db_queries.observe(view, db_queries)
+            self.serialize_seconds.observe(view, serialize)
+            self.render_seconds.observe(view, render)
+            if size is not None:
+                self.response_bytes.observe(view, size)
+
+    def export(self, extra=()):
+        lines = []
+        with self.lock:
+            for histogram in self.histograms:
+                histogram.export(lines)
+        for name, help_text, value in extra:
+            lines.append('# HELP %s %s' % (name, help_text))
+            lines.append('# TYPE %s counter' % name)
+            lines.append('%s %d' % (name, value))
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self.lock:
+            for histogram in self.histograms:
+                histogram.series.clear()
+
+
+registry = Registry()
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_bound(bound):
+    return repr(float(bound)) if isinstance(bound, float) else str(bound)
@@ -0,0 +1,134 @@
+import contextvars
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+
+from .metrics import registry
+
+logger = logging.getLogger('LittleLemonAPI.metrics')
+
+current_metrics = contextvars.ContextVar('littlelemon_request_metrics', default=None)
+
+
+class RequestMetrics:
+    # Per-request timings, filled in by the middleware and by record_query().
+    # Only keeps the SQL text when slow-request logging asks for it.
+    def __init__(self, capture_sql):
+        self.capture_sql = capture_sql
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = []
+        self.view_start = None
+        self.render_start = None
+        self.db_before_render = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    # Installed once per connection (see install_query_recorder). The current
+    # request is found through a context variable, which asgiref copies into
+    # the worker thread that runs async ORM calls, so both sync and async
+    # views are counted.
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.count += 1
+        metrics.seconds += elapsed
+        if metrics.capture_sql:
+            metrics.statements.append((elapsed, sql))
+
+
+def install_query_recorder(conn):
+    if record_query not in conn.execute_wrappers:
+        conn.execute_wrappers.append(record_query)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_seconds = getattr(settings, 'METRICS_SLOW_REQUEST_MS', 500) / 1000.0
+        self.log_sql = getattr(settings, 'METRICS_LOG_SLOW_SQL', False)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+            # Django wraps sync hooks in sync_to_async on an async stack; use
+            # coroutine versions so the hooks don't cost a thread hop.
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        install_query_recorder(connection)
+        metrics = request._metrics = RequestMetrics(self.log_sql)
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        self.record(request, response, metrics, start, time.perf_counter())
+        return response
+
+    async def __acall__(self, request):
+        metrics = request._metrics = RequestMetrics(self.log_sql)
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        self.record(request, response, metrics, start, time.perf_counter())
+        return response
+
+    def record(self, request, response, metrics, start, end):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else '<unresolved>'
+        # serialize = view time outside SQL; render = DRF renderer time.
+        serialize = render = 0.0
+        if metrics.view_start is not None:
+            if metrics.render_start is not None:
+                serialize = metrics.render_start - metrics.view_start - metrics.db_before_render
+                render = end - metrics.render_start
+            else:
+                serialize = end - metrics.view_start - metrics.seconds
+            serialize = max(0.0, serialize)
+        size = None if response.streaming else len(response.content)
+
+        wall = end - start
+        registry.record(view, wall, metrics.seconds, metrics.count, serialize, render, size)
+        if wall >= self.slow_seconds:
+            self.log_slow(request, view, wall, metrics)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics.view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Called right before DRF's Response is rendered.
+        request._metrics.render_start = time.perf_counter()
+        request._metrics.db_before_render = request._metrics.seconds
+        return response
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        return MetricsMiddleware.process_view(self, request, view_func, view_args, view_kwargs)
+
+    async def aprocess_template_response(self, request, response):
+        return MetricsMiddleware.process_template_response(self, request, response)
+
+    def log_slow(self, request, view, wall, metrics):
+        logger.warning(
+            'Slow request %s %s (%s): %.1f ms, %d queries, %.1f ms in SQL',
+            request.method, request.path, view, wall * 1000, metrics.count, metrics.seconds * 1000,
+        )
+        for elapsed, sql in sorted(metrics.statements, reverse=True):
+            logger.warning('  %.1f ms  %s', elapsed * 1000, sql)
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+FTS_TABLE = 'LittleLemonAPI_menuitem_fts'
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    # prefix='2 3' adds prefix indexes so short "abc"* queries stay index lookups.
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE %s USING fts5(title, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        % FTS_TABLE
+    )
+    schema_editor.execute(
+        'INSERT INTO %s (rowid, title) SELECT id, title FROM "LittleLemonAPI_menuitem"' % FTS_TABLE
+    )
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS %s' % FTS_TABLE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LittleLemonAPI', '0005_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
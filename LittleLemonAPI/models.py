@@ -1,11 +1,113 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 
 # Create your models here.
+class MenuItemQuerySet(models.QuerySet):
+    def with_category(self):
+        return self.select_related('category')
+
+    def rows(self, *fields):
+        # Named tuples of the menu item and its category, for
+        # FastMenuItemSerializer; `fields` narrows them down.
+        return self.values_list(
+            *(fields or ('id', 'title', 'price', 'featured', 'category_id', 'category__slug', 'category__title')),
+            named=True)
+
+
+class OrderQuerySet(models.QuerySet):
+    def with_items(self):
+        # Two queries total: the orders, then every item of the page joined to
+        # its menu item and category.
+        return self.prefetch_related(models.Prefetch(
+            'order_items',
+            queryset=OrderItem.objects.select_related('menuitem__category'),
+        ))
+
+
+class CartQuerySet(models.QuerySet):
+    # INSERT ... SELECT ... ON CONFLICT DO UPDATE: creates the line or adds to
+    # its quantity, priced from the menu item, in a single statement.
+    INCREMENT_SQL = '''
+        INSERT INTO {cart} (user_id, menuitem_id, quantity, unit_price, price)
+        SELECT %s, id, %s, price, price * %s FROM {menuitem} WHERE id = %s AND price * %s < %s
+        ON CONFLICT (user_id, menuitem_id) DO UPDATE SET
+            quantity = {cart}.quantity + excluded.quantity,
+            unit_price = excluded.unit_price,
+            price = excluded.unit_price * ({cart}.quantity + excluded.quantity)
+        WHERE {cart}.quantity + excluded.quantity <= %s
+            AND excluded.unit_price * ({cart}.quantity + excluded.quantity) < %s
+        RETURNING id, quantity, unit_price, price
+    '''
+    # Bounds of the quantity and price columns.
+    MAX_QUANTITY = 32767
+    PRICE_LIMIT = 10 ** 4
+
+    def increment(self, user, menuitem_id, quantity):
+        # Returns the updated line, or None if the menu item doesn't exist or
+        # the new quantity or line price would not fit.
+        features = connection.features
+        if not (features.supports_update_conflicts_with_target and features.can_return_rows_from_bulk_insert):
+            return self._increment_fallback(user, menuitem_id, quantity)
+        sql = self.INCREMENT_SQL.format(
+            cart=connection.ops.quote_name(Cart._meta.db_table),
+            menuitem=connection.ops.quote_name(MenuItem._meta.db_table),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [
+                user.pk, quantity, quantity, menuitem_id, quantity, self.PRICE_LIMIT,
+                self.MAX_QUANTITY, self.PRICE_LIMIT,
+            ])
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        line = Cart(id=row[0], user=user, menuitem_id=menuitem_id, quantity=row[1],
+                    unit_price=self._money(row[2]), price=self._money(row[3]))
+        line._state.adding = False
+        line._state.db = self.db
+        return line
+
+    def _increment_fallback(self, user, menuitem_id, quantity):
+        # UPDATE ... SET quantity = quantity + n, then INSERT if there was no
+        # line yet; a concurrent INSERT makes us retry the UPDATE.
+        unit_price = MenuItem.objects.filter(pk=menuitem_id).values_list('price', flat=True).first()
+        if unit_price is None:
+            return None
+        limit = self.MAX_QUANTITY
+        if unit_price > 0:
+            limit = min(limit, int((self.PRICE_LIMIT - Decimal('0.01')) / unit_price))
+        lines = self.filter(user=user, menuitem_id=menuitem_id)
+        for _ in range(2):
+            with transaction.atomic():
+                updated = lines.filter(quantity__lte=limit - quantity).update(
+                    quantity=models.F('quantity') + quantity,
+                    unit_price=unit_price,
+                    price=unit_price * (models.F('quantity') + quantity),
+                )
+                if updated:
+                    return lines.get()
+                if quantity > limit or lines.exists():
+                    return None
+                try:
+                    with transaction.atomic():
+                        return self.create(user=user, menuitem_id=menuitem_id, quantity=quantity,
+                                           unit_price=unit_price, price=unit_price * quantity)
+                except IntegrityError:
+                    continue
+        return None
+
+    def _money(self, value):
+        # SQLite hands back floats for decimal columns.
+        field = Cart._meta.get_field('price')
+        return field.to_python(value).quantize(Decimal(1).scaleb(-field.decimal_places))
+
+
 class Category(models.Model):
     slug = models.SlugField()
     title = models.CharField(max_length=255, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
     def __str__(self):
         return self.title
     
@@ -18,13 +120,19 @@ class MenuItem(models.Model):
         Category,
         on_delete=models.PROTECT
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = MenuItemQuerySet.as_manager()
+
     def __str__(self):
         return self.title
     
 class Cart(models.Model):
+    # Indexed through the (user, menuitem) unique constraint.
     user = models.ForeignKey(
         User,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     menuitem = models.ForeignKey(
         MenuItem,
@@ -33,19 +141,39 @@ class Cart(models.Model):
     quantity = models.SmallIntegerField()
     unit_price = models.DecimalField(max_digits=6, decimal_places=2)
     price = models.DecimalField(max_digits=6, decimal_places=2)
+
+    objects = CartQuerySet.as_manager()
+
     class Meta:
-        unique_together = ('menuitem', 'user')
+        unique_together = ('user', 'menuitem')
         
 class Order(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    delivery_crew = models.ForeignKey(User, related_name='delivery_orders', null=True, blank=True, on_delete=models.SET_NULL)
+    # The foreign keys are covered by the composite indexes below.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    delivery_crew = models.ForeignKey(User, related_name='delivery_orders', null=True, blank=True, on_delete=models.SET_NULL, db_index=False)
     status = models.IntegerField(choices=[(0, 'Out for Delivery'), (1, 'Delivered')])
     total = models.DecimalField(max_digits=10, decimal_places=2, null=True)
     date = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Manager order list: ORDER BY date DESC, id DESC.
+            models.Index(fields=['date'], name='order_date_idx'),
+            # Customer order list: WHERE user_id = ? ORDER BY date.
+            models.Index(fields=['user', 'date'], name='order_user_date_idx'),
+            # Delivery crew list and status changes: WHERE delivery_crew_id = ? [AND status = ?].
+            models.Index(fields=['delivery_crew', 'status', 'date'], name='order_crew_status_date_idx'),
+            # Filtering all orders by status.
+            models.Index(fields=['status', 'date'], name='order_status_date_idx'),
+        ]
     
 class OrderItem(models.Model):
     order = models.ForeignKey(
         Order,
+        related_name='order_items',
         on_delete=models.CASCADE
     )
     menuitem = models.ForeignKey(
@@ -62,3 +190,21 @@ class OrderItem(models.Model):
     
     
 
+class DailySalesRollup(models.Model):
+    # Per day and menu item, maintained by rollup.record_order() at checkout.
+    # order_count is the number of orders that contained the item.
+    day = models.DateField()
+    menuitem = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    quantity = models.IntegerField(default=0)
+    order_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('day', 'menuitem')
+
+
+class DailyOrderRollup(models.Model):
+    # Per day totals; orders with several items are counted once here.
+    day = models.DateField(unique=True)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    order_count = models.IntegerField(default=0)
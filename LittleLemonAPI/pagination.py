@@ -0,0 +1,177 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from django.utils.encoding import force_str
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    # Seek pagination: the cursor carries the sort key of the last row seen,
+    # so every page is an index range scan + LIMIT instead of an OFFSET.
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering = ('-id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    def get_page_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.fields = [self._get_field(queryset.model, name) for name in self.ordering]
+        self.cursor = self.decode_cursor(request)
+
+        reverse = self.cursor is not None and self.cursor['reverse']
+        ordering = [self._flip(name) for name in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(self._seek_filter(ordering, self.cursor['position']))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        reverse = self.cursor is not None and self.cursor['reverse']
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+                if size > 0:
+                    return min(size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+        for backend in getattr(view, 'filter_backends', []):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        # NULLs sort outside every seek range, and relations aren't one
+        # column, so a cursor over either skips rows or can't be decoded.
+        if not ordering or not all(self._is_seekable(queryset.model, name) for name in ordering):
+            ordering = self.ordering
+        ordering = tuple(ordering)
+        # The primary key is the tie-breaker that makes the sort key unique.
+        if not any(name.lstrip('-') in ('id', 'pk') for name in ordering):
+            ordering += ('-id',) if ordering[-1].startswith('-') else ('id',)
+        return ordering
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position = data['p']
+            if len(position) != len(self.fields):
+                raise ValueError
+            return {
+                'reverse': bool(data.get('r')),
+                'position': [field.to_python(value) for field, value in zip(self.fields, position)],
+            }
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        data = {'p': [field.value_to_string(obj) for field in self.fields]}
+        if reverse:
+            data['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+        return replace_query_param(self.base_url, self.cursor_query_param, force_str(encoded))
+
+    def _seek_filter(self, ordering, position):
+        # (a, b) > (x, y)  ==>  a >= x AND (a > x OR (a = x AND b > y))
+        # The leading range term is redundant but lets the planner seek on
+        # an index over the first sort column.
+        strict = Q()
+        equal = Q()
+        for name, value in zip(ordering, position):
+            lookup = '%s__%s' % (name.lstrip('-'), 'lt' if name.startswith('-') else 'gt')
+            strict |= equal & Q(**{lookup: value})
+            equal &= Q(**{name.lstrip('-'): value})
+        first = ordering[0]
+        leading = '%s__%s' % (first.lstrip('-'), 'lte' if first.startswith('-') else 'gte')
+        return Q(**{leading: position[0]}) & strict
+
+    def _get_field(self, model, name):
+        name = name.lstrip('-')
+        if name == 'pk':
+            return model._meta.pk
+        return model._meta.get_field(name)
+
+    def _is_seekable(self, model, name):
+        try:
+            field = self._get_field(model, name)
+        except FieldDoesNotExist:
+            return False
+        return not field.null and not field.is_relation
+
+    def _flip(self, name):
+        return name[1:] if name.startswith('-') else '-' + name
+
+
+class MenuItemPagination(KeysetPagination):
+    ordering = ('id',)
+
+
+class OrderPagination(KeysetPagination):
+    ordering = ('-date', '-id')
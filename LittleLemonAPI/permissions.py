@@ -1,8 +1,9 @@
 from rest_framework.permissions import BasePermission
+from .roles import is_manager
 
 class IsManager(BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='Manager').exists()
+        return is_manager(request)
 
 # class IsCustomerOrDeliveryCrew(BasePermission):
 #     def has_permission(self, request, view):
@@ -0,0 +1,66 @@
+import io
+
+from django.conf import settings
+from rest_framework.utils import encoders
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# The bytes orjson writes for U+2028 / U+2029, which DRF always escapes.
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+# Integers past 64 bits, which some orjson versions read as floats, found
+# as runs of 19 digits once every digit is mapped to 0 (much faster than a
+# regex). Runs inside strings match too and merely take the slow path.
+DIGITS_TO_ZERO = bytes.maketrans(b'123456789', b'000000000')
+LONG_INTEGER = b'0' * 19
+
+
+# Anything orjson doesn't encode itself (Decimal, lazy strings, and
+# datetimes through OPT_PASSTHROUGH_DATETIME) is converted the way DRF's
+# encoder does it, e.g. datetimes truncated to milliseconds.
+default = encoders.JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    # Same bytes as DRF's JSONRenderer with the default UNICODE_JSON,
+    # COMPACT_JSON and STRICT_JSON settings, encoded with orjson when it is
+    # installed. Indented output (the browsable API, `; indent=` in Accept),
+    # other settings and anything orjson rejects, like integers beyond 64
+    # bits, go through DRF's encoder. Known difference: floats in exponent
+    # form are written 1e16 rather than 1e+16; the API's decimals are strings.
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact or not self.strict
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if LINE_SEPARATOR in ret or PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(LINE_SEPARATOR, b'\\u2028').replace(PARAGRAPH_SEPARATOR, b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    # orjson for UTF-8 bodies with STRICT_JSON; bodies with big integers and
+    # anything orjson rejects are handed to DRF's parser, which keeps them
+    # exact and words its errors the usual way.
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read() if stream is not None else b''
+        if LONG_INTEGER in body.translate(DIGITS_TO_ZERO):
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type, parser_context)
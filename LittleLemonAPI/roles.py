@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.cache import cache
+
+MANAGER = 'Manager'
+DELIVERY_CREW = 'Delivery Crew'
+
+
+def _cache_key(user_id):
+    return 'roles:%s' % user_id
+
+
+def get_group_names(request):
+    # Resolved at most once per request (memoized on the request, which DRF
+    # shares between the permission classes and the view) and, optionally,
+    # once per ROLE_CACHE_TIMEOUT across requests.
+    names = getattr(request, '_group_names', None)
+    if names is not None:
+        return names
+    user = request.user
+    if not user or not user.is_authenticated:
+        return frozenset()
+
+    timeout = getattr(settings, 'ROLE_CACHE_TIMEOUT', 0)
+    if timeout:
+        names = cache.get(_cache_key(user.pk))
+    if names is None:
+        names = frozenset(user.groups.values_list('name', flat=True))
+        if timeout:
+            cache.set(_cache_key(user.pk), names, timeout)
+    request._group_names = names
+    return names
+
+
+async def aget_group_names(request):
+    names = getattr(request, '_group_names', None)
+    if names is not None:
+        return names
+    user = request.user
+    if not user or not user.is_authenticated:
+        return frozenset()
+
+    timeout = getattr(settings, 'ROLE_CACHE_TIMEOUT', 0)
+    if timeout:
+        names = await cache.aget(_cache_key(user.pk))
+    if names is None:
+        names = frozenset([name async for name in user.groups.values_list('name', flat=True)])
+        if timeout:
+            await cache.aset(_cache_key(user.pk), names, timeout)
+    request._group_names = names
+    return names
+
+
+def has_role(request, name):
+    return name in get_group_names(request)
+
+
+def is_manager(request):
+    return has_role(request, MANAGER)
+
+
+def is_delivery_crew(request):
+    return has_role(request, DELIVERY_CREW)
+
+
+def invalidate_roles(*user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
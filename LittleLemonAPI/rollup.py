@@ -0,0 +1,99 @@
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyOrderRollup, DailySalesRollup, Order, OrderItem
+
+ITEM_UPSERT = '''
+    INSERT INTO {table} (day, menuitem_id, revenue, quantity, order_count)
+    SELECT %s, menuitem_id, %s * SUM(price), %s * SUM(quantity), %s
+    FROM {items} WHERE order_id = %s GROUP BY menuitem_id
+    ON CONFLICT (day, menuitem_id) DO UPDATE SET
+        revenue = {table}.revenue + excluded.revenue,
+        quantity = {table}.quantity + excluded.quantity,
+        order_count = {table}.order_count + excluded.order_count
+'''
+
+DAY_UPSERT = '''
+    INSERT INTO {table} (day, revenue, order_count) VALUES (%s, %s, %s)
+    ON CONFLICT (day) DO UPDATE SET
+        revenue = {table}.revenue + excluded.revenue,
+        order_count = {table}.order_count + excluded.order_count
+'''
+
+
+def record_order(order, sign=1):
+    # Adds an order (sign=1) to the rollups, or takes it out again (sign=-1).
+    # Must run in the transaction that writes or deletes the order, after its
+    # items exist. Two upserts whatever the size of the order.
+    day = timezone.localdate(order.date)
+    if connection.features.supports_update_conflicts_with_target:
+        quote = connection.ops.quote_name
+        day_value = connection.ops.adapt_datefield_value(day)
+        total = connection.ops.adapt_decimalfield_value(sign * (order.total or 0), 12, 2)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                ITEM_UPSERT.format(table=quote(DailySalesRollup._meta.db_table), items=quote(OrderItem._meta.db_table)),
+                [day_value, sign, sign, sign, order.pk],
+            )
+            cursor.execute(
+                DAY_UPSERT.format(table=quote(DailyOrderRollup._meta.db_table)),
+                [day_value, total, sign],
+            )
+    else:
+        _record_order_fallback(order, day, sign)
+    if sign < 0:
+        DailySalesRollup.objects.filter(day=day, order_count__lte=0).delete()
+        DailyOrderRollup.objects.filter(day=day, order_count__lte=0).delete()
+
+
+def _record_order_fallback(order, day, sign):
+    # For backends without INSERT ... ON CONFLICT: lock or create each row,
+    # then increment it.
+    lines = (
+        OrderItem.objects.filter(order=order).values('menuitem_id')
+        .annotate(revenue=Sum('price'), quantity=Sum('quantity'))
+    )
+    for line in lines:
+        row, _ = DailySalesRollup.objects.select_for_update().get_or_create(day=day, menuitem_id=line['menuitem_id'])
+        DailySalesRollup.objects.filter(pk=row.pk).update(
+            revenue=F('revenue') + sign * line['revenue'],
+            quantity=F('quantity') + sign * line['quantity'],
+            order_count=F('order_count') + sign,
+        )
+    row, _ = DailyOrderRollup.objects.select_for_update().get_or_create(day=day)
+    DailyOrderRollup.objects.filter(pk=row.pk).update(
+        revenue=F('revenue') + sign * (order.total or 0),
+        order_count=F('order_count') + sign,
+    )
+
+
+def rebuild(batch_size=1000):
+    # Recomputes both rollups from Order/OrderItem. The aggregates have one
+    # row per day (and item), so memory is bounded by the output size.
+    with transaction.atomic():
+        DailySalesRollup.objects.all().delete()
+        DailyOrderRollup.objects.all().delete()
+
+        item_rows = (
+            OrderItem.objects.annotate(day=TruncDate('order__date'))
+            .values('day', 'menuitem_id')
+            .annotate(revenue=Sum('price'), quantity=Sum('quantity'), order_count=Count('order_id', distinct=True))
+            .order_by()
+        )
+        DailySalesRollup.objects.bulk_create(
+            (DailySalesRollup(**row) for row in item_rows.iterator()), batch_size=batch_size)
+
+        day_rows = (
+            Order.objects.annotate(day=TruncDate('date'))
+            .values('day')
+            .annotate(revenue=Sum('total'), order_count=Count('id'))
+            .order_by()
+        )
+        DailyOrderRollup.objects.bulk_create(
+            (DailyOrderRollup(day=row['day'], revenue=row['revenue'] or 0, order_count=row['order_count'])
+             for row in day_rows.iterator()),
+            batch_size=batch_size,
+        )
+    return DailySalesRollup.objects.count(), DailyOrderRollup.objects.count()
@@ -0,0 +1,67 @@
+import re
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .catalog import catalog_cache
+from .models import MenuItem
+
+# FTS5 index over MenuItem.title, rowid = menu item id. Created by migration
+# 0006 on SQLite and kept in sync by the post_save/post_delete receivers in
+# signals.py. bulk_create() skips those, so call rebuild() after bulk loads.
+FTS_TABLE = 'LittleLemonAPI_menuitem_fts'
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def enabled():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(text):
+    # Every word must match as a prefix: 'chick sal' -> "chick"* AND "sal"*.
+    # Quoting each word keeps FTS5 operators in user input from being parsed.
+    words = WORD_RE.findall(text)
+    return ' AND '.join('"%s"*' % word for word in words)
+
+
+def search(queryset, text):
+    words = WORD_RE.findall(text)
+    if not words:
+        return queryset
+    if enabled():
+        return queryset.filter(id__in=RawSQL(
+            'SELECT rowid FROM %s WHERE %s MATCH %%s' % (FTS_TABLE, FTS_TABLE),
+            [match_expression(text)],
+        ))
+    condition = Q()
+    for word in words:
+        condition &= Q(title__icontains=word)
+    return queryset.filter(condition)
+
+
+def index_menuitem(item):
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s WHERE rowid = %%s' % FTS_TABLE, [item.pk])
+        cursor.execute('INSERT INTO %s (rowid, title) VALUES (%%s, %%s)' % FTS_TABLE, [item.pk, item.title])
+
+
+def unindex_menuitem(pk):
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s WHERE rowid = %%s' % FTS_TABLE, [pk])
+
+
+def rebuild():
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s' % FTS_TABLE)
+        cursor.execute('INSERT INTO %s (rowid, title) SELECT id, title FROM %s' % (
+            FTS_TABLE, connection.ops.quote_name(MenuItem._meta.db_table)))
+    # Cached ?search= responses were built from the old index.
+    transaction.on_commit(catalog_cache.bump)
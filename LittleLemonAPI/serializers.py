@@ -1,7 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Category, MenuItem, Cart, Order, OrderItem
+from .models import Category, MenuItem, Cart, CartQuerySet, Order, OrderItem
+from django.db import transaction
 from django.utils import timezone
+from .events import assignment_events, publish
+from .rollup import record_order
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -36,7 +39,6 @@ class CartSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         menuitem_id = validated_data.pop('menuitem_id')
-        print(f"MenuItem ID received: {menuitem_id} (Type: {type(menuitem_id)})")  # Debug output
 
         if isinstance(menuitem_id, int):
             menuitem = MenuItem.objects.get(id=menuitem_id)
@@ -46,6 +48,8 @@ class CartSerializer(serializers.ModelSerializer):
         unit_price = menuitem.price
         quantity = validated_data.get('quantity', 1)
         price = unit_price * quantity
+        if price >= CartQuerySet.PRICE_LIMIT:
+            raise serializers.ValidationError({'quantity': ['Quantity too large for one cart line.']})
         
         validated_data['menuitem'] = menuitem
         validated_data['unit_price'] = unit_price
@@ -53,6 +57,137 @@ class CartSerializer(serializers.ModelSerializer):
 
         return super().create(validated_data)
 
+def increment_cart_lines(user, lines):
+    # ?mode=increment: adds each line's quantity to the cart with one upsert
+    # per line (see CartQuerySet.increment); nothing is read first. Errors
+    # are only looked into once an upsert has touched no row.
+    with transaction.atomic():
+        carts = []
+        for index, line in enumerate(lines):
+            cart = Cart.objects.increment(user, line['menuitem_id'], line['quantity'])
+            if cart is None:
+                if MenuItem.objects.filter(pk=line['menuitem_id']).exists():
+                    error = 'Quantity too large for one cart line.'
+                else:
+                    error = 'Menu item not found.'
+                raise serializers.ValidationError({index: {'menuitem_id': [error]}} if len(lines) > 1 else {'menuitem_id': [error]})
+            carts.append(cart)
+        return carts
+
+class CartLineListSerializer(serializers.ListSerializer):
+    def validate(self, attrs):
+        # One query for every referenced price. Errors are keyed by the line's
+        # position in the request body, like DRF's own per-item errors.
+        self.menuitems = MenuItem.objects.only('price').in_bulk([line['menuitem_id'] for line in attrs])
+        errors = {}
+        seen = set()
+        for index, line in enumerate(attrs):
+            menuitem_id = line['menuitem_id']
+            if menuitem_id not in self.menuitems:
+                errors[index] = {'menuitem_id': ['Menu item not found.']}
+            elif menuitem_id in seen:
+                errors[index] = {'menuitem_id': ['Duplicate menu item in request.']}
+            elif self.menuitems[menuitem_id].price * line['quantity'] >= CartQuerySet.PRICE_LIMIT:
+                # The line price has to fit Cart.price, as in ?mode=increment.
+                errors[index] = {'quantity': ['Quantity too large for one cart line.']}
+            seen.add(menuitem_id)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def create(self, validated_data):
+        lines = []
+        for line in validated_data:
+            unit_price = self.menuitems[line['menuitem_id']].price
+            lines.append(Cart(
+                user=line['user'],
+                menuitem_id=line['menuitem_id'],
+                quantity=line['quantity'],
+                unit_price=unit_price,
+                price=unit_price * line['quantity'],
+            ))
+        # Insert new lines and overwrite existing ones in a single statement.
+        return Cart.objects.bulk_create(
+            lines,
+            update_conflicts=True,
+            unique_fields=['user', 'menuitem'],
+            update_fields=['quantity', 'unit_price', 'price'],
+        )
+
+
+class CartLineSerializer(serializers.Serializer):
+    menuitem_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, max_value=32767)
+
+    class Meta:
+        list_serializer_class = CartLineListSerializer
+
+
+class OrderBatchListSerializer(serializers.ListSerializer):
+    def validate(self, attrs):
+        errors = {}
+        seen = set()
+        for index, change in enumerate(attrs):
+            if change['order_id'] in seen:
+                errors[index] = {'order_id': ['Duplicate order in request.']}
+            seen.add(change['order_id'])
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
+
+class OrderAssignmentSerializer(serializers.Serializer):
+    order_id = serializers.IntegerField()
+    # null takes the order off its delivery crew member.
+    delivery_crew_id = serializers.IntegerField(allow_null=True)
+
+    class Meta:
+        list_serializer_class = OrderBatchListSerializer
+
+
+class OrderStatusChangeSerializer(serializers.Serializer):
+    order_id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=Order._meta.get_field('status').choices)
+
+    class Meta:
+        list_serializer_class = OrderBatchListSerializer
+
+
+def update_orders(queryset, changes, field):
+    # Batch assignment/status change: changes maps order id -> new value of
+    # `field`. One query reads the current crew and status of the orders
+    # that `queryset` allows, one bulk_update writes the changed ones, and
+    # the crew events that Order.save() would have sent go out on commit.
+    # Returns {order_id: 'updated' | 'unchanged' | 'not_found'}.
+    results = {}
+    now = timezone.now()
+    with transaction.atomic():
+        current = {
+            row[0]: row[1:]
+            for row in queryset.filter(pk__in=list(changes)).values_list('id', 'delivery_crew_id', 'status')
+        }
+        orders = []
+        events = []
+        for order_id, value in changes.items():
+            if order_id not in current:
+                results[order_id] = 'not_found'
+                continue
+            crew, status = current[order_id]
+            order = Order(id=order_id, delivery_crew_id=crew, status=status, updated_at=now)
+            if getattr(order, field) == value:
+                results[order_id] = 'unchanged'
+                continue
+            setattr(order, field, value)
+            orders.append(order)
+            events.extend(assignment_events(order, crew, status))
+            results[order_id] = 'updated'
+        # bulk_update skips auto_now, hence updated_at above.
+        Order.objects.bulk_update(orders, [field, 'updated_at'])
+        if events:
+            transaction.on_commit(lambda: publish(events))
+    return results
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
     menuitem = MenuItemSerializer(read_only=True)
     menuitem_id = serializers.PrimaryKeyRelatedField(
@@ -82,38 +217,55 @@ class OrderSerializer(serializers.ModelSerializer):
         validated_data['user'] = user
         validated_data['date'] = timezone.now()
 
-        # Get cart items
-        cart_items = Cart.objects.filter(user=user)
-        if not cart_items.exists():
-            raise serializers.ValidationError("Cart is empty.")
-
-        total = sum(item.price for item in cart_items)
-
-        # Create the order
-        order = super().create(validated_data)
-        order.total = total
-        order.save()
-
-        # Add order items
-        for item in cart_items:
-            # Check if the item already exists for this order
-            order_item, created = OrderItem.objects.get_or_create(
-                order=order,
-                menuitem=item.menuitem,
-                defaults={
-                    'quantity': item.quantity,
-                    'unit_price': item.unit_price,
-                    'price': item.price
-                }
+        with transaction.atomic():
+            # One SELECT reads and locks every cart line, and the total is
+            # summed from those same lines. A concurrent checkout by the same
+            # user waits for the lock and then finds the lines gone, on any
+            # database; SQLite has no row locks but takes the write lock when
+            # the transaction starts (see settings.DATABASES).
+            lines = list(
+                Cart.objects.select_for_update().filter(user=user)
+                .values_list('id', 'menuitem_id', 'quantity', 'unit_price', 'price')
             )
+            if not lines:
+                raise serializers.ValidationError("Cart is empty.")
+
+            validated_data['total'] = sum(line[4] for line in lines)
+            order = super().create(validated_data)
+
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, menuitem_id=menuitem_id, quantity=quantity, unit_price=unit_price, price=price)
+                for _, menuitem_id, quantity, unit_price, price in lines
+            ])
+
+            record_order(order)
+
+            # Clear the cart
+            Cart.objects.filter(id__in=[line[0] for line in lines]).delete()
+
+        return Order.objects.with_items().get(pk=order.pk)
+
 
-        # Clear the cart
-        cart_items.delete()
 
-        return order
 
+class SalesByDaySerializer(serializers.Serializer):
+    day = serializers.DateField()
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
+    orders = serializers.IntegerField(source='order_count')
 
+class SalesByCategorySerializer(serializers.Serializer):
+    category_id = serializers.IntegerField(source='menuitem__category_id')
+    category = serializers.CharField(source='menuitem__category__title')
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
+    quantity = serializers.IntegerField()
 
+class SalesByItemSerializer(serializers.Serializer):
+    menuitem_id = serializers.IntegerField()
+    title = serializers.CharField(source='menuitem__title')
+    category = serializers.CharField(source='menuitem__category__title')
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
+    quantity = serializers.IntegerField()
+    orders = serializers.IntegerField(source='order_count')
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,121 @@
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .usercache import token_cache_key, user_cache
+from .catalog import catalog_cache
+from .events import assignment_events, order_event, publish
+from .middleware import install_query_recorder
+from .models import Category, MenuItem, Order
+from .roles import invalidate_roles
+from .rollup import record_order
+from . import search, throttling
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog(sender, **kwargs):
+    # After commit: a bump before it lets a concurrent read cache the old rows
+    # under the new version. Runs at once outside a transaction.
+    transaction.on_commit(catalog_cache.bump)
+
+
+@receiver(post_save, sender=MenuItem)
+def index_menuitem(sender, instance, **kwargs):
+    search.index_menuitem(instance)
+
+
+@receiver(post_delete, sender=MenuItem)
+def unindex_menuitem(sender, instance, **kwargs):
+    search.unindex_menuitem(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    # Fired by user.groups.add()/remove() as well as group.user_set.add()/
+    # remove(), which is what the manager/delivery-crew endpoints call.
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_roles(instance.pk)
+    elif action == 'pre_clear':
+        invalidate_roles(*instance.user_set.values_list('pk', flat=True))
+    elif pk_set:
+        invalidate_roles(*pk_set)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Covers deactivation and password changes, which both save the user.
+    user_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    user_cache.invalidate(token_cache_key(instance.key))
+
+
+@receiver(pre_delete, sender=Group)
+def invalidate_group_members(sender, instance, **kwargs):
+    invalidate_roles(*instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Order)
+def remove_from_rollups(sender, instance, **kwargs):
+    # Runs before the cascade removes the order's items.
+    record_order(instance, sign=-1)
+
+
+@receiver(pre_save, sender=Order)
+def remember_assignment(sender, instance, **kwargs):
+    # One indexed lookup per order save, rather than a post_init hook on
+    # every order loaded for reading.
+    previous = None
+    if not instance._state.adding and instance.pk is not None:
+        previous = Order.objects.filter(pk=instance.pk).values_list('delivery_crew_id', 'status').first()
+    instance._previous_assignment = previous or (None, None)
+
+
+@receiver(post_save, sender=Order)
+def publish_order_events(sender, instance, **kwargs):
+    old_crew, old_status = getattr(instance, '_previous_assignment', (None, None))
+    events = assignment_events(instance, old_crew, old_status)
+    if events:
+        transaction.on_commit(lambda: publish(events))
+
+
+@receiver(post_delete, sender=Order)
+def publish_order_removed(sender, instance, **kwargs):
+    if instance.delivery_crew_id is not None:
+        events = [(instance.delivery_crew_id, order_event('unassigned', instance))]
+        transaction.on_commit(lambda: publish(events))
+
+
+@receiver(connection_created)
+def install_metrics_recorder(sender, connection, **kwargs):
+    # Async views run their queries on worker-thread connections that the
+    # middleware never touches directly.
+    install_query_recorder(connection)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute('PRAGMA %s = %s' % (name, value))
+
+
+@receiver(setting_changed)
+def reset_throttle_store(sender, setting, **kwargs):
+    if setting == 'THROTTLE_COUNTER_STORE':
+        throttling.reset_counter_store()
@@ -1,3 +1,1378 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import csv
+import datetime
+import gzip
+import io
+import json
+import tempfile
+import threading
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import Cart, CartQuerySet, Category, DailyOrderRollup, DailySalesRollup, MenuItem, Order, OrderItem
+from .authentication import user_cache
+from .catalog import catalog_cache
+from .events import get_broker
+from .fast_serializers import FastMenuItemSerializer, FastOrderSerializer, FieldSelection
+from .serializers import MenuItemSerializer, OrderSerializer
+from .metrics import registry
+from . import compression, export, renderers, rollup, search, throttling
+from .benchmarks import startup
+from .management.commands import explain_queries
+from .pagination import MenuItemPagination
+from .views import MenuItemDetail, MenuItemList, OrderDetailView, OrderExportView, OrderListCreateView
+
+
+# The configured catalog cache and throttle counters are files shared with
+# any server running on this host; tests get private ones.
+TEST_CACHES = dict(
+    settings.CACHES,
+    catalog={'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-catalog'},
+    throttle={'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-throttle'},
+)
+TEST_THROTTLE_COUNTER_STORE = {'BACKEND': 'LittleLemonAPI.throttling.CacheCounterStore', 'OPTIONS': {'alias': 'throttle'}}
+
+
+@override_settings(CACHES=TEST_CACHES, THROTTLE_COUNTER_STORE=TEST_THROTTLE_COUNTER_STORE)
+class APITestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches['catalog'].clear()
+        caches['throttle'].clear()
+        user_cache.clear()
+        self.client = APIClient()
+        self.manager = User.objects.create(username='manager')
+        Group.objects.get_or_create(name='Manager')[0].user_set.add(self.manager)
+        Group.objects.get_or_create(name='Delivery Crew')
+        self.customer = User.objects.create(username='customer')
+        self.category = Category.objects.create(slug='mains', title='Mains')
+
+    def make_items(self, count, price='5.00'):
+        return MenuItem.objects.bulk_create([
+            MenuItem(title='Item %03d' % i, price=Decimal(price), featured=False, category=self.category)
+            for i in range(count)
+        ])
+
+
+class KeysetPaginationTests(APITestCase):
+    def walk(self, url):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        return seen
+
+    def test_menu_items_pages_cover_every_row_once(self):
+        items = self.make_items(7)
+        self.client.force_authenticate(self.customer)
+        seen = self.walk('/api/menu-items?page_size=3')
+        self.assertEqual(seen, [item.id for item in items])
+
+    def test_ordering_with_ties_uses_id_tie_breaker(self):
+        items = self.make_items(5)
+        self.client.force_authenticate(self.customer)
+        seen = self.walk('/api/menu-items?page_size=2&ordering=-price')
+        self.assertEqual(seen, sorted(item.id for item in items)[::-1])
+
+    def test_page_size_is_capped(self):
+        self.make_items(5)
+        self.client.force_authenticate(self.customer)
+        with mock.patch.object(MenuItemPagination, 'max_page_size', 2):
+            response = self.client.get('/api/menu-items?page_size=1000')
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_orders_are_newest_first_and_previous_link_round_trips(self):
+        orders = [Order.objects.create(user=self.customer, status=0, total=1) for _ in range(5)]
+        self.client.force_authenticate(self.customer)
+        seen = self.walk('/api/orders?page_size=2')
+        self.assertEqual(seen, [order.id for order in reversed(orders)])
+
+        first = self.client.get('/api/orders?page_size=2')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+
+    def test_orders_walk_to_the_end_for_a_non_default_ordering(self):
+        orders = [Order.objects.create(user=self.customer, status=i % 2, total=1) for i in range(5)]
+        self.client.force_authenticate(self.customer)
+        seen = self.walk('/api/orders?page_size=2&ordering=status')
+        self.assertEqual(seen, [order.id for order in sorted(orders, key=lambda order: (order.status, order.id))])
+
+    def test_orders_fall_back_to_the_default_ordering_for_nullable_fields(self):
+        crew = User.objects.create(username='crew')
+        orders = [Order.objects.create(user=self.customer, status=0, total=None) for _ in range(5)]
+        Order.objects.filter(pk=orders[0].pk).update(delivery_crew=crew)
+        self.client.force_authenticate(self.manager)
+        newest_first = [order.id for order in reversed(orders)]
+        # Not in ordering_fields, and refused by the paginator even when a
+        # view lets every field through.
+        for fields in (OrderListCreateView.ordering_fields, '__all__'):
+            with mock.patch.object(OrderListCreateView, 'ordering_fields', fields):
+                for ordering in ('delivery_crew', '-delivery_crew', '-total'):
+                    caches['throttle'].clear()
+                    self.assertEqual(self.walk('/api/orders?page_size=2&ordering=%s' % ordering), newest_first)
+
+    def test_invalid_cursor_is_404(self):
+        self.client.force_authenticate(self.customer)
+        response = self.client.get('/api/menu-items?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+
+class OrderQueryCountTests(APITestCase):
+    def make_orders(self, count, lines=3):
+        items = self.make_items(lines)
+        for _ in range(count):
+            order = Order.objects.create(user=self.customer, status=0, total=15)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+                for item in items
+            ])
+
+    def count_queries(self, url, user):
+        self.client.force_authenticate(user)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context), response
+
+    def test_order_list_query_count_does_not_grow_with_orders(self):
+        self.make_orders(1)
+        small, response = self.count_queries('/api/orders', self.manager)
+        self.assertEqual(len(response.data['results'][0]['order_items']), 3)
+        self.assertEqual(response.data['results'][0]['order_items'][0]['menuitem']['category']['slug'], 'mains')
+
+        self.make_orders(10)
+        large, response = self.count_queries('/api/orders', self.manager)
+        self.assertEqual(len(response.data['results']), 11)
+        self.assertEqual(small, large)
+
+    def test_delivery_crew_list_query_count_does_not_grow_with_orders(self):
+        self.make_orders(1)
+        Order.objects.update(delivery_crew=self.manager)
+        small, _ = self.count_queries('/api/delivery-crew/orders', self.manager)
+        self.make_orders(10)
+        Order.objects.update(delivery_crew=self.manager)
+        large, response = self.count_queries('/api/delivery-crew/orders', self.manager)
+        self.assertEqual(len(response.data), 11)
+        self.assertEqual(small, large)
+
+
+class MenuFilterTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.desserts = Category.objects.create(slug='desserts', title='Desserts')
+        rows = [
+            ('Grilled Chicken', '12.50', False, self.category),
+            ('Chicken Soup', '6.00', True, self.category),
+            ('Crème Brûlée', '7.25', True, self.desserts),
+            ('Lemon Tart', '5.00', False, self.desserts),
+        ]
+        self.items = [
+            MenuItem.objects.create(title=title, price=Decimal(price), featured=featured, category=category)
+            for title, price, featured, category in rows
+        ]
+        self.client.force_authenticate(self.customer)
+
+    def titles(self, query):
+        response = self.client.get('/api/menu-items?' + query)
+        self.assertEqual(response.status_code, 200)
+        return [row['title'] for row in response.data['results']]
+
+    def test_filters_and_ordering(self):
+        self.assertEqual(self.titles('category=%d' % self.desserts.id), ['Crème Brûlée', 'Lemon Tart'])
+        self.assertEqual(self.titles('featured=true'), ['Chicken Soup', 'Crème Brûlée'])
+        self.assertEqual(self.titles('price_min=6&price_max=10&ordering=-price'), ['Crème Brûlée', 'Chicken Soup'])
+        self.assertEqual(self.titles('ordering=title')[0], 'Chicken Soup')
+        # Ordering by a field that isn't listed is ignored.
+        self.assertEqual(self.titles('ordering=featured')[0], 'Grilled Chicken')
+
+    def test_search_matches_word_prefixes(self):
+        self.assertEqual(self.titles('search=chick'), ['Grilled Chicken', 'Chicken Soup'])
+        self.assertEqual(self.titles('search=chick+so'), ['Chicken Soup'])
+        self.assertEqual(self.titles('search=creme'), ['Crème Brûlée'])
+        self.assertEqual(self.titles('search=hick'), [])
+        self.assertEqual(self.titles('search=%22OR%22*+NEAR('), [])
+        self.assertEqual(self.titles('search=chick&featured=false'), ['Grilled Chicken'])
+
+    def test_index_follows_saves_and_deletes(self):
+        item = self.items[3]
+        item.title = 'Lemon Sorbet'
+        item.save()
+        self.items[0].delete()
+        self.assertEqual(self.titles('search=sorb'), ['Lemon Sorbet'])
+        self.assertEqual(self.titles('search=tart'), [])
+        self.assertEqual(self.titles('search=grilled'), [])
+
+    def test_rebuild_indexes_bulk_created_items(self):
+        self.make_items(2)
+        self.assertEqual(self.titles('search=item'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            search.rebuild()
+        self.assertEqual(self.titles('search=item'), ['Item 000', 'Item 001'])
+
+
+class FastSerializerParityTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.items = [
+            MenuItem.objects.create(title='Crème Brûlée', price=Decimal('7.5'), featured=True, category=self.category),
+            MenuItem.objects.create(title='Soup "du jour"', price=Decimal('1234.00'), featured=False, category=self.category),
+        ]
+        self.order = Order.objects.create(user=self.customer, status=0, total=None)
+        OrderItem.objects.create(order=self.order, menuitem=self.items[0], quantity=3,
+                                 unit_price=Decimal('7.5'), price=Decimal('22.5'))
+        crew = User.objects.create(username='crew')
+        self.delivered = Order.objects.create(user=self.customer, delivery_crew=crew, status=1, total=Decimal('12.3'))
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def test_serializers_render_the_same_json(self):
+        items = MenuItem.objects.with_category().order_by('id')
+        expected = self.render(MenuItemSerializer(items, many=True).data)
+        self.assertEqual(self.render(FastMenuItemSerializer(items, many=True).data), expected)
+        self.assertEqual(self.render(FastMenuItemSerializer(items.rows(), many=True).data), expected)
+
+        orders = Order.objects.with_items().order_by('id')
+        self.assertEqual(self.render(FastOrderSerializer(orders, many=True).data),
+                         self.render(OrderSerializer(orders, many=True).data))
+
+    def get_both(self, views, url, user):
+        self.client.force_authenticate(user)
+        fast = self.client.get(url)
+        caches['catalog'].clear()
+        with contextlib.ExitStack() as stack:
+            for view in views:
+                stack.enter_context(mock.patch.object(view, 'fast_serializer_class', None))
+            slow = self.client.get(url)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, slow.content)
+
+    def test_views_render_the_same_json(self):
+        self.get_both([MenuItemList], '/api/menu-items?ordering=-price', self.customer)
+        self.get_both([MenuItemDetail], '/api/menu-items/%d' % self.items[0].id, self.customer)
+        self.get_both([OrderListCreateView], '/api/orders', self.manager)
+        self.get_both([OrderDetailView], '/api/orders/%d' % self.order.id, self.customer)
+
+    def test_writes_keep_the_model_serializer(self):
+        self.client.force_authenticate(self.manager)
+        response = self.client.patch('/api/menu-items/%d' % self.items[0].id, {'price': '8.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['price'], '8.00')
+
+
+class SparseFieldsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.items = self.make_items(3)
+        self.order = Order.objects.create(user=self.customer, delivery_crew=self.manager, status=0, total=Decimal('10'))
+        OrderItem.objects.bulk_create([
+            OrderItem(order=self.order, menuitem=item, quantity=1, unit_price=item.price, price=item.price)
+            for item in self.items[:2]
+        ])
+        self.client.force_authenticate(self.manager)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [query['sql'] for query in context.captured_queries]
+
+    def test_full_selection_matches_the_default(self):
+        orders = Order.objects.with_items()
+        full = FieldSelection(FastOrderSerializer.fields, set(FastOrderSerializer.expandable))
+        self.assertEqual(FastOrderSerializer(orders, many=True, selection=full).data,
+                         FastOrderSerializer(orders, many=True).data)
+        full = FieldSelection(FastMenuItemSerializer.fields, {'category'})
+        rows = FastMenuItemSerializer.prepare(MenuItem.objects.all(), full)
+        self.assertEqual(FastMenuItemSerializer(rows, many=True, selection=full).data,
+                         FastMenuItemSerializer(MenuItem.objects.rows(), many=True).data)
+
+    def test_menu_items(self):
+        data, queries = self.get('/api/menu-items?fields=title,category&expand=&ordering=-price&page_size=2')
+        self.assertEqual(data['results'], [
+            {'title': 'Item 002', 'category': self.category.id}, {'title': 'Item 001', 'category': self.category.id}])
+        self.assertNotIn('category"."slug', queries[-1])
+        self.assertNotIn('featured', queries[-1])
+        # The cursor still carries the sort key, though price isn't rendered.
+        data, _ = self.get(data['next'])
+        self.assertEqual(data['results'], [{'title': 'Item 000', 'category': self.category.id}])
+
+        data, queries = self.get('/api/menu-items/%d?fields=price,category' % self.items[0].id)
+        self.assertEqual(data, {'price': '5.00', 'category': {'id': self.category.id, 'slug': 'mains', 'title': 'Mains'}})
+        self.assertNotIn('"title" AS "title"', queries[-1])
+        self.assertEqual(self.get('/api/async/menu-items/%d?fields=price,category' % self.items[0].id)[0], data)
+
+    def test_orders(self):
+        data, queries = self.get('/api/orders?fields=id,status,total')
+        self.assertEqual(data['results'], [{'id': self.order.id, 'status': 0, 'total': '10.00'}])
+        # No order items, and no columns but the rendered ones and the sort key.
+        self.assertFalse([sql for sql in queries if 'orderitem' in sql])
+        self.assertNotIn('user_id', queries[-1])
+
+        data, queries = self.get('/api/delivery-crew/orders?fields=order_items&expand=')
+        self.assertEqual(data, [{'order_items': [item.id for item in self.order.order_items.order_by('id')]}])
+        self.assertNotIn('menuitem', queries[-1])
+
+        data, queries = self.get('/api/orders?fields=order_items&expand=order_items.menuitem')
+        menuitem = data['results'][0]['order_items'][0]['menuitem']
+        self.assertEqual(menuitem['category'], self.category.id)
+        self.assertNotIn('LittleLemonAPI_category', queries[-1])
+
+        data, _ = self.get('/api/orders?expand=order_items')
+        self.assertEqual(data['results'][0]['order_items'][0]['menuitem'], self.items[0].id)
+
+    def test_unknown_names_are_rejected(self):
+        response = self.client.get('/api/orders?fields=id,secret&expand=user')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'fields', 'expand'})
+
+
+class FastJSONTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        item = MenuItem.objects.create(title='Crème Brûlée', price=Decimal('7.5'), featured=True, category=self.category)
+        order = Order.objects.create(user=self.customer, status=0, total=Decimal('22.5'))
+        OrderItem.objects.create(order=order, menuitem=item, quantity=3, unit_price=Decimal('7.5'), price=Decimal('22.5'))
+
+    def assertSameBytes(self, data, accepted_media_type=None):
+        self.assertEqual(renderers.FastJSONRenderer().render(data, accepted_media_type),
+                         JSONRenderer().render(data, accepted_media_type))
+
+    def test_renderer_matches_drf(self):
+        orders = Order.objects.with_items().order_by('id')
+        self.assertSameBytes(FastOrderSerializer(orders, many=True).data)
+        self.assertSameBytes({
+            'text': 'a\u2028b\u2029c "é"', 1: [None, True, 1.5], 'price': Decimal('7.50'),
+            'at': datetime.datetime(2024, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.timezone.utc),
+            'big': 2 ** 70,
+        })
+        self.assertSameBytes({'a': [1, 2]}, 'application/json; indent=4')
+        self.assertEqual(renderers.FastJSONRenderer().render(None), b'')
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertSameBytes({'text': 'a\u2028b'})
+
+    def test_parser_matches_drf(self):
+        fast, slow = renderers.FastJSONParser(), JSONParser()
+        for body in [b'{"a": [1, 2.5, null], "b": "\\u00e9"}', b'{"big": 123456789012345678901234567890}']:
+            self.assertEqual(fast.parse(io.BytesIO(body)), slow.parse(io.BytesIO(body)))
+        for body in [b'{"a": ', b'{"a": NaN}']:
+            with self.assertRaises(ParseError) as expected:
+                slow.parse(io.BytesIO(body))
+            with self.assertRaises(ParseError) as raised:
+                fast.parse(io.BytesIO(body))
+            self.assertEqual(str(raised.exception), str(expected.exception))
+
+    def test_views_use_the_fast_renderer(self):
+        self.client.force_authenticate(self.manager)
+        data = {'title': 'Tea', 'price': '2.00', 'featured': False, 'category_id': self.category.id}
+        response = self.client.post('/api/menu-items', data, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIsInstance(response.accepted_renderer, renderers.FastJSONRenderer)
+        response = self.client.get('/api/orders')
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+
+class ConditionalRequestTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.items = self.make_items(3)
+        self.order = Order.objects.create(user=self.customer, status=0, total=5)
+        OrderItem.objects.create(order=self.order, menuitem=self.items[0], quantity=1, unit_price=5, price=5)
+
+    def revalidate(self, url, user, **headers):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, headers=headers)
+        return response, len(context)
+
+    def test_catalog_not_modified_skips_the_database(self):
+        self.client.force_authenticate(self.customer)
+        for url in ['/api/menu-items', '/api/menu-items/%d' % self.items[0].id, '/api/categories']:
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+            self.assertTrue(first['Last-Modified'])
+            response, queries = self.revalidate(url, self.customer, if_none_match=first['ETag'])
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+            self.assertEqual(response['ETag'], first['ETag'])
+            self.assertEqual(queries, 0)
+
+    def test_detail_validators_do_not_match_other_items(self):
+        self.client.force_authenticate(self.customer)
+        first = self.client.get('/api/menu-items/%d' % self.items[0].id)
+        self.assertNotEqual(self.client.get('/api/menu-items/%d' % self.items[1].id)['ETag'], first['ETag'])
+        for headers in [{'if_none_match': first['ETag']}, {'if_modified_since': first['Last-Modified']}]:
+            response, _ = self.revalidate('/api/menu-items/99999', self.customer, **headers)
+            self.assertEqual(response.status_code, 404)
+            response, _ = self.revalidate('/api/menu-items/%d' % self.items[1].id, self.customer, **headers)
+            self.assertEqual(response.status_code, 200 if 'if_none_match' in headers else 304)
+
+    def test_catalog_write_changes_the_etag(self):
+        self.client.force_authenticate(self.customer)
+        etag = self.client.get('/api/menu-items').headers['ETag']
+        self.client.force_authenticate(self.manager)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/update-item-of-the-day/%d' % self.items[1].id)
+        self.items[1].refresh_from_db()
+        self.assertTrue(self.items[1].featured)
+        self.assertGreater(self.items[1].updated_at, self.items[0].updated_at)
+
+        response, _ = self.revalidate('/api/menu-items', self.customer, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since(self):
+        self.client.force_authenticate(self.customer)
+        first = self.client.get('/api/categories')
+        response, _ = self.revalidate('/api/categories', self.customer, if_modified_since=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_order_detail(self):
+        url = '/api/orders/%d' % self.order.id
+        self.client.force_authenticate(self.customer)
+        etag = self.client.get(url).headers['ETag']
+        response, queries = self.revalidate(url, self.customer, if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        # The user's roles and the validators; the order isn't loaded.
+        self.assertEqual(queries, 2)
+
+        # Other customers still get a 404, validators or not.
+        other = User.objects.create(username='other')
+        response, _ = self.revalidate(url, other, if_none_match=etag)
+        self.assertEqual(response.status_code, 404)
+
+        updated_at = self.order.updated_at
+        self.client.force_authenticate(self.manager)
+        self.client.patch(url, {'status': 1}, format='json')
+        self.order.refresh_from_db()
+        self.assertGreater(self.order.updated_at, updated_at)
+        response, _ = self.revalidate(url, self.customer, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 1)
+
+
+class CatalogCacheTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.make_items(3)
+        catalog_cache.reset_stats()
+        self.client.force_authenticate(self.customer)
+
+    def test_hit_skips_database_and_returns_same_bytes(self):
+        first = self.client.get('/api/menu-items')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/menu-items')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(second['Content-Type'], 'application/json')
+        self.assertEqual(catalog_cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_query_string_is_part_of_the_key(self):
+        self.client.get('/api/menu-items?page_size=1')
+        response = self.client.get('/api/menu-items?page_size=2')
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_model_writes_invalidate(self):
+        self.client.get('/api/categories')
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(slug='drinks', title='Drinks')
+        response = self.client.get('/api/categories')
+        self.assertEqual(len(response.json()), 2)
+
+    def test_bump_waits_for_commit(self):
+        # Until the write commits, readers must keep the old version: a
+        # response built from the old rows is only cached under it.
+        version = catalog_cache.version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                MenuItem.objects.first().save()
+                self.assertEqual(catalog_cache.version(), version)
+            self.assertEqual(catalog_cache.version(), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(catalog_cache.version(), version)
+
+    def test_item_of_the_day_invalidates(self):
+        item = MenuItem.objects.first()
+        self.client.get('/api/menu-items/%d' % item.id)
+        self.client.force_authenticate(self.manager)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post('/api/update-item-of-the-day/%d' % item.id).status_code, 200)
+        response = self.client.get('/api/menu-items/%d' % item.id)
+        self.assertTrue(response.json()['featured'])
+        self.assertEqual(self.client.post('/api/update-item-of-the-day/0').status_code, 404)
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'api.example.com'])
+    def test_links_are_rebuilt_for_the_requested_host(self):
+        first = self.client.get('/api/menu-items?page_size=1')
+        self.assertTrue(first.json()['next'].startswith('http://testserver/api/menu-items?'))
+        with self.assertNumQueries(0):
+            other = self.client.get('/api/menu-items?page_size=1', HTTP_HOST='api.example.com')
+        self.assertEqual(other.json()['next'], first.json()['next'].replace('testserver', 'api.example.com'))
+        self.assertEqual(other.json()['results'], first.json()['results'])
+        self.assertEqual(self.client.get('/api/menu-items?page_size=1').content, first.content)
+
+    def test_file_based_backend(self):
+        with tempfile.TemporaryDirectory() as location:
+            backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}
+            with override_settings(CACHES=dict(TEST_CACHES, default=backend, catalog=backend)):
+                first = self.client.get('/api/menu-items')
+                with self.assertNumQueries(0):
+                    second = self.client.get('/api/menu-items')
+                self.assertEqual(first.content, second.content)
+                MenuItem.objects.update(featured=True)
+                catalog_cache.bump()
+                self.assertTrue(self.client.get('/api/menu-items').json()['results'][0]['featured'])
+
+
+class FakeBrotli:
+    @staticmethod
+    def compress(content, quality):
+        return b'br:' + gzip.compress(content)
+
+
+class CompressionTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.make_items(40)
+        self.client.force_authenticate(self.customer)
+
+    def test_large_bodies_are_gzipped(self):
+        responses = []
+        for _ in range(2):
+            # A miss that fills the catalog cache, then a hit.
+            responses.append(self.client.get('/api/menu-items', headers={'accept-encoding': 'gzip, deflate'}))
+        plain = self.client.get('/api/menu-items')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        for response in responses:
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(gzip.decompress(response.content), plain.content)
+            self.assertEqual(int(response['Content-Length']), len(response.content))
+            self.assertIn('Accept-Encoding', response['Vary'])
+            self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+        response = self.client.get('/api/menu-items', headers={'accept-encoding': 'gzip', 'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_cache_hits_are_not_recompressed(self):
+        self.client.get('/api/menu-items', headers={'accept-encoding': 'gzip'})
+        with mock.patch.object(compression, 'compress', side_effect=AssertionError):
+            response = self.client.get('/api/menu-items', headers={'accept-encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_small_or_unwanted_bodies_are_left_alone(self):
+        for url, headers in [
+            ('/api/categories', {'accept-encoding': 'gzip'}),
+            ('/api/menu-items', {}),
+            ('/api/menu-items', {'accept-encoding': 'gzip;q=0, identity'}),
+            ('/api/orders/export', {'accept-encoding': 'gzip'}),
+        ]:
+            self.client.force_authenticate(self.manager)
+            response = self.client.get(url, headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.has_header('Content-Encoding'), url)
+        with override_settings(COMPRESSION_MIN_SIZE=10 ** 6):
+            response = self.client.get('/api/menu-items', headers={'accept-encoding': 'gzip'})
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_brotli_is_preferred_when_installed(self):
+        request = RequestFactory().get('/', headers={'accept-encoding': 'gzip, br'})
+        self.assertEqual(compression.negotiate(request), 'gzip' if compression.brotli is None else 'br')
+        with mock.patch.object(compression, 'brotli', FakeBrotli):
+            self.assertEqual(compression.negotiate(request), 'br')
+            request = RequestFactory().get('/', headers={'accept-encoding': 'br;q=0.5, gzip'})
+            self.assertEqual(compression.negotiate(request), 'gzip')
+            request = RequestFactory().get('/', headers={'accept-encoding': '*'})
+            self.assertEqual(compression.negotiate(request), 'br')
+            response = self.client.get('/api/menu-items', headers={'accept-encoding': 'br'})
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertTrue(response.content.startswith(b'br:'))
+
+
+class CheckoutTests(APITestCase):
+    def fill_cart(self, user, lines):
+        items = self.make_items(lines, price='2.50')
+        Cart.objects.bulk_create([
+            Cart(user=user, menuitem=item, quantity=2, unit_price=item.price, price=item.price * 2)
+            for item in items
+        ])
+
+    def checkout(self, user):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/orders', {'status': 0}, format='json')
+        return response, len(context)
+
+    def test_checkout_copies_cart_and_clears_it(self):
+        self.fill_cart(self.customer, 3)
+        response, _ = self.checkout(self.customer)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total'], '15.00')
+        self.assertEqual(len(response.data['order_items']), 3)
+        self.assertEqual(OrderItem.objects.filter(order_id=response.data['id']).count(), 3)
+        self.assertFalse(Cart.objects.filter(user=self.customer).exists())
+
+    def test_empty_cart_is_rejected_without_creating_an_order(self):
+        response, _ = self.checkout(self.customer)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_cart_lines_are_locked(self):
+        self.fill_cart(self.customer, 2)
+        with mock.patch.object(CartQuerySet, 'select_for_update', autospec=True,
+                               side_effect=CartQuerySet.select_for_update) as lock:
+            response, _ = self.checkout(self.customer)
+        self.assertEqual(response.status_code, 201)
+        lock.assert_called_once()
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        self.fill_cart(self.customer, 1)
+        _, small = self.checkout(self.customer)
+        self.fill_cart(self.manager, 20)
+        _, large = self.checkout(self.manager)
+        self.assertEqual(small, large)
+
+
+class RoleResolutionTests(APITestCase):
+    def group_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [q['sql'] for q in context if q['sql'].startswith('SELECT "auth_group"."name"')]
+
+    def test_roles_are_resolved_once_per_request(self):
+        self.client.force_authenticate(self.manager)
+        # IsManager and the view both ask; one lookup serves both.
+        self.assertEqual(len(self.group_queries('/api/groups/manager/users')), 1)
+        self.assertEqual(len(self.group_queries('/api/groups/manager/users')), 1)
+
+    @override_settings(ROLE_CACHE_TIMEOUT=300)
+    def test_roles_are_cached_across_requests_when_enabled(self):
+        self.client.force_authenticate(self.manager)
+        self.assertEqual(len(self.group_queries('/api/groups/manager/users')), 1)
+        self.assertEqual(self.group_queries('/api/groups/manager/users'), [])
+
+    @override_settings(ROLE_CACHE_TIMEOUT=300)
+    def test_membership_changes_invalidate(self):
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/groups/manager/users').status_code, 403)
+
+        self.client.force_authenticate(self.manager)
+        response = self.client.post('/api/groups/manager/users', {'user_id': self.customer.id})
+        self.assertEqual(response.status_code, 201)
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/groups/manager/users').status_code, 200)
+
+        response = self.client.delete('/api/groups/manager/users/%d' % self.customer.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/groups/manager/users').status_code, 403)
+
+
+class BulkCartTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.items = self.make_items(3, price='3.00')
+        self.client.force_authenticate(self.customer)
+
+    def test_adds_and_updates_many_lines(self):
+        Cart.objects.create(user=self.customer, menuitem=self.items[0], quantity=1, unit_price=3, price=3)
+        body = [
+            {'menuitem_id': self.items[0].id, 'quantity': 4},
+            {'menuitem_id': self.items[1].id, 'quantity': 2},
+        ]
+        with self.assertNumQueries(3):
+            response = self.client.post('/api/cart/menu-items', body, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 2)
+        lines = dict(Cart.objects.filter(user=self.customer).values_list('menuitem_id', 'price'))
+        self.assertEqual(lines, {self.items[0].id: Decimal('12.00'), self.items[1].id: Decimal('6.00')})
+
+    def test_errors_are_reported_per_line(self):
+        body = [
+            {'menuitem_id': self.items[0].id, 'quantity': 1},
+            {'menuitem_id': 0, 'quantity': 1},
+            {'menuitem_id': self.items[0].id, 'quantity': 1},
+        ]
+        response = self.client.post('/api/cart/menu-items', body, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {1, 2})
+        self.assertIn('menuitem_id', response.data[1])
+        self.assertIn('menuitem_id', response.data[2])
+
+        body[1] = {'menuitem_id': self.items[1].id, 'quantity': 0}
+        response = self.client.post('/api/cart/menu-items', body[:2], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('quantity', response.data[1])
+        self.assertFalse(Cart.objects.exists())
+
+    def test_line_price_must_fit_the_cart(self):
+        body = [
+            {'menuitem_id': self.items[0].id, 'quantity': 1},
+            {'menuitem_id': self.items[1].id, 'quantity': 32767},
+        ]
+        response = self.client.post('/api/cart/menu-items', body, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {1})
+        self.assertIn('quantity', response.data[1])
+        self.assertFalse(Cart.objects.exists())
+        self.assertEqual(self.client.get('/api/cart/menu-items').status_code, 200)
+
+        response = self.client.post('/api/cart/menu-items', body[1], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('quantity', response.data)
+        self.assertFalse(Cart.objects.exists())
+
+    def test_single_line_post_still_works(self):
+        response = self.client.post('/api/cart/menu-items', {'menuitem_id': self.items[2].id, 'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['price'], '6.00')
+
+
+class CartIncrementTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.items = self.make_items(2, price='2.50')
+        self.client.force_authenticate(self.customer)
+
+    def test_increment_adds_to_existing_line_in_one_statement(self):
+        url = '/api/cart/menu-items?mode=increment'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'menuitem_id': self.items[0].id, 'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len([q for q in queries if 'LittleLemonAPI_cart' in q['sql']]), 1)
+        response = self.client.post(url, {'menuitem_id': self.items[0].id, 'quantity': 3}, format='json')
+        self.assertEqual((response.data['quantity'], response.data['unit_price'], response.data['price']), (5, '2.50', '12.50'))
+        self.assertEqual(Cart.objects.get().quantity, 5)
+
+    def test_increment_list_adds_up_repeated_items(self):
+        response = self.client.post('/api/cart/menu-items?mode=increment', [
+            {'menuitem_id': self.items[0].id, 'quantity': 1},
+            {'menuitem_id': self.items[1].id, 'quantity': 1},
+            {'menuitem_id': self.items[0].id, 'quantity': 2},
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted((row['quantity'], row['price']) for row in response.data), [(1, '2.50'), (3, '7.50')])
+
+    def test_increment_errors_roll_back(self):
+        url = '/api/cart/menu-items?mode=increment'
+        response = self.client.post(url, [
+            {'menuitem_id': self.items[0].id, 'quantity': 1},
+            {'menuitem_id': 999999, 'quantity': 1},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {1: {'menuitem_id': ['Menu item not found.']}})
+        self.assertFalse(Cart.objects.exists())
+
+        # 4000 x 2.50 no longer fits the price column.
+        self.client.post(url, {'menuitem_id': self.items[0].id, 'quantity': 3000}, format='json')
+        response = self.client.post(url, {'menuitem_id': self.items[0].id, 'quantity': 1000}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'menuitem_id': ['Quantity too large for one cart line.']})
+        self.assertEqual(Cart.objects.get().quantity, 3000)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CartIncrementConcurrencyTests(TransactionTestCase):
+    def test_parallel_increments_are_not_lost(self):
+        category = Category.objects.create(slug='mains', title='Mains')
+        item = MenuItem.objects.create(title='Soup', price=Decimal('3.00'), featured=False, category=category)
+        user = User.objects.create(username='hungry')
+        threads, per_thread = 4, 10
+        errors = []
+
+        def add():
+            try:
+                done = 0
+                while done < per_thread:
+                    try:
+                        Cart.objects.increment(user, item.id, 1)
+                    except OperationalError as exc:
+                        # The in-memory test database uses SQLite's shared
+                        # cache, whose table locks fail instead of waiting.
+                        if 'locked' not in str(exc):
+                            raise
+                        continue
+                    done += 1
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=add) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(errors, [])
+        line = Cart.objects.get(user=user, menuitem=item)
+        self.assertEqual((line.quantity, line.price), (threads * per_thread, Decimal('120.00')))
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        catalog_cache.reset_stats()
+        self.manager.is_staff = True
+        self.manager.save()
+
+    def test_requests_are_recorded_per_view(self):
+        self.client.force_authenticate(self.customer)
+        self.client.get('/api/categories')
+        self.client.get('/api/categories')
+        self.assertEqual(self.client.get('/api/metrics').status_code, 403)
+
+        self.client.force_authenticate(self.manager)
+        response = self.client.get('/api/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE littlelemon_request_seconds histogram', body)
+        self.assertIn('littlelemon_request_seconds_count{view="categories"} 2', body)
+        self.assertIn('littlelemon_db_queries_bucket{view="categories",le="+Inf"} 2', body)
+        self.assertIn('littlelemon_catalog_cache_hits_total 1', body)
+
+    @override_settings(METRICS_SLOW_REQUEST_MS=0, METRICS_LOG_SLOW_SQL=True)
+    def test_slow_requests_log_their_sql(self):
+        self.client.force_authenticate(self.customer)
+        with self.assertLogs('LittleLemonAPI.metrics', level='WARNING') as logs:
+            self.client.get('/api/orders')
+        self.assertIn('Slow request GET /api/orders (order-list-create)', logs.output[0])
+        self.assertTrue(any('LittleLemonAPI_order' in line for line in logs.output[1:]))
+
+
+class AsyncViewTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.crew = User.objects.create(username='crew')
+        Group.objects.get(name='Delivery Crew').user_set.add(self.crew)
+        self.items = self.make_items(3)
+        self.order = Order.objects.create(user=self.customer, delivery_crew=self.crew, status=0, total=10)
+        OrderItem.objects.create(order=self.order, menuitem=self.items[0], quantity=2, unit_price=5, price=10)
+
+    def auth(self, user):
+        return {'Authorization': 'Bearer %s' % AccessToken.for_user(user)}
+
+    async def assert_same(self, user, sync_url, async_url):
+        headers = self.auth(user)
+        expected = await self.async_client.get(sync_url, headers=headers)
+        actual = await self.async_client.get(async_url, headers=headers)
+        self.assertEqual(actual.status_code, expected.status_code)
+        self.assertEqual(actual['Content-Type'], expected['Content-Type'])
+        # Pagination links point back at the route that was called.
+        self.assertEqual(actual.content.replace(b'/api/async/', b'/api/'), expected.content)
+
+    async def test_responses_match_sync_views(self):
+        await self.assert_same(self.customer, '/api/menu-items?page_size=2', '/api/async/menu-items?page_size=2')
+        await self.assert_same(self.customer, '/api/menu-items/%d' % self.items[1].id,
+                               '/api/async/menu-items/%d' % self.items[1].id)
+        await self.assert_same(self.customer, '/api/categories', '/api/async/categories')
+
+    async def test_order_responses_match_sync_views(self):
+        await self.assert_same(self.crew, '/api/delivery-crew/orders', '/api/async/delivery-crew/orders')
+        await self.assert_same(self.customer, '/api/orders/%d' % self.order.id, '/api/async/orders/%d' % self.order.id)
+        await self.assert_same(self.manager, '/api/orders/%d' % self.order.id, '/api/async/orders/%d' % self.order.id)
+
+    async def test_authentication_and_permissions_are_enforced(self):
+        response = await self.async_client.get('/api/async/delivery-crew/orders')
+        self.assertEqual(response.status_code, 401)
+        self.assertTrue(response['WWW-Authenticate'].startswith('Bearer'))
+
+        response = await self.async_client.get('/api/async/orders/%d' % self.order.id, headers=self.auth(self.crew))
+        self.assertEqual(response.status_code, 404)
+
+        response = await self.async_client.get(
+            '/api/async/menu-items', headers={'Authorization': 'Bearer not-a-token'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_catalog_responses_are_cached_and_invalidated(self):
+        headers = self.auth(self.customer)
+        self.client.get('/api/async/categories', headers=headers)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/async/categories', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        # The JWT's user and the body both come from caches.
+        self.assertEqual(len(queries), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(slug='desserts', title='Desserts')
+        response = self.client.get('/api/async/categories', headers=headers)
+        self.assertEqual(len(response.json()), 2)
+
+    async def test_throttle_and_cache_calls_stay_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        threads = []
+
+        def record(method):
+            def wrapper(*args, **kwargs):
+                threads.append((method.__name__, threading.get_ident()))
+                return method(*args, **kwargs)
+            return wrapper
+
+        with mock.patch.object(throttling.CacheCounterStore, 'incr', record(throttling.CacheCounterStore.incr)), \
+                mock.patch.object(catalog_cache, 'get', record(catalog_cache.get)), \
+                mock.patch.object(catalog_cache, 'store', record(catalog_cache.store)):
+            response = await self.async_client.get('/api/async/categories', headers=self.auth(self.customer))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({name for name, _ in threads}, {'incr', 'get', 'store'})
+        self.assertNotIn(loop_thread, [thread for _, thread in threads])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AuthCacheTests(APITestCase):
+    url = '/api/menu-items'
+
+    def setUp(self):
+        super().setUp()
+        self.customer.set_password('secret')
+        self.customer.save()
+        self.jwt = {'Authorization': 'Bearer %s' % AccessToken.for_user(self.customer)}
+        self.token = Token.objects.create(user=self.customer)
+        user_cache.reset_stats()
+
+    def get(self, headers):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, headers=headers)
+        return response.status_code, len(context)
+
+    def test_repeat_requests_skip_the_user_lookup(self):
+        for headers in [self.jwt, {'Authorization': 'Token %s' % self.token.key}]:
+            self.assertEqual(self.get(headers)[0], 200)
+            # Both the user and the (catalog-cached) body come from memory.
+            self.assertEqual(self.get(headers), (200, 0))
+        self.assertEqual(user_cache.stats()['hits'], 2)
+
+    def test_deactivation_password_change_and_token_deletion_invalidate(self):
+        self.get(self.jwt)
+        self.customer.is_active = False
+        self.customer.save()
+        self.assertEqual(self.get(self.jwt)[0], 401)
+
+        self.customer.is_active = True
+        self.customer.save()
+        self.get(self.jwt)
+        self.customer.set_password('changed')
+        self.customer.save()
+        self.assertEqual(user_cache.stats()['size'], 0)
+
+        token = {'Authorization': 'Token %s' % self.token.key}
+        self.get(token)
+        self.token.delete()
+        self.assertEqual(self.get(token)[0], 401)
+
+    def test_cached_users_are_copies(self):
+        self.get(self.jwt)
+        key = list(user_cache._entries)[0]
+        first, _ = user_cache.get(key)
+        first.first_name = 'changed'
+        second, _ = user_cache.get(key)
+        self.assertEqual(second.first_name, '')
+        self.assertIsNot(first, second)
+
+    @override_settings(AUTH_CACHE_TIMEOUT=0)
+    def test_timeout_zero_disables_the_cache(self):
+        self.get(self.jwt)
+        self.assertEqual(self.get(self.jwt), (200, 1))
+
+
+class OrderEventStreamTests(APITestCase):
+    url = '/api/delivery-crew/orders/events'
+
+    def setUp(self):
+        super().setUp()
+        self.crew = User.objects.create(username='crew')
+        self.other_crew = User.objects.create(username='other-crew')
+        Group.objects.get(name='Delivery Crew').user_set.add(self.crew, self.other_crew)
+        self.order = Order.objects.create(user=self.customer, status=0, total=10)
+
+    def auth(self, user):
+        return {'Authorization': 'Bearer %s' % AccessToken.for_user(user)}
+
+    def assign(self, order, user):
+        self.client.force_authenticate(self.manager)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/assign-order/%d/%d' % (order.id, user.id))
+        self.assertEqual(response.status_code, 200)
+
+    async def test_assignment_is_pushed_to_the_crew_member(self):
+        response = await self.async_client.get(self.url, headers=self.auth(self.crew))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+        await sync_to_async(self.assign)(self.order, self.crew)
+        chunk = await asyncio.wait_for(anext(stream), 5)
+        event, data = chunk.decode().split('\n')[:2]
+        self.assertEqual(event, 'event: assigned')
+        self.assertEqual(json.loads(data[len('data: '):]),
+                         {'event': 'assigned', 'order': self.order.id, 'status': 0, 'delivery_crew': self.crew.id})
+
+        # A client disconnect cancels the read, like the ASGI handler does.
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertEqual(get_broker().subscriber_count(), 0)
+
+    def test_signals_publish_to_the_affected_crew(self):
+        with mock.patch('LittleLemonAPI.events.get_broker') as get_broker_mock:
+            publish = get_broker_mock.return_value.publish
+            self.assign(self.order, self.crew)
+            self.assign(self.order, self.other_crew)
+            self.client.force_authenticate(self.other_crew)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post('/api/update-order-status/%d' % self.order.id)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.order.refresh_from_db()
+                self.order.save()
+        calls = [(user_id, event['event']) for (user_id, event), _ in publish.call_args_list]
+        self.assertEqual(calls, [
+            (self.crew.id, 'assigned'),
+            (self.crew.id, 'unassigned'),
+            (self.other_crew.id, 'assigned'),
+            (self.other_crew.id, 'status'),
+        ])
+
+    async def test_only_delivery_crew_over_asgi(self):
+        response = await self.async_client.get(self.url, headers=self.auth(self.customer))
+        self.assertEqual(response.status_code, 403)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+    def test_wsgi_is_refused(self):
+        self.client.force_authenticate(self.crew)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 501)
+
+
+class BatchOrderUpdateTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.crew = User.objects.create(username='crew')
+        self.other_crew = User.objects.create(username='other-crew')
+        Group.objects.get(name='Delivery Crew').user_set.add(self.crew, self.other_crew)
+        self.orders = [Order.objects.create(user=self.customer, status=0, total=10) for _ in range(4)]
+
+    def post(self, user, url, data):
+        self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, data, format='json')
+        return response
+
+    def test_assign_reports_per_order_and_updates_in_one_statement(self):
+        self.orders[3].delivery_crew = self.crew
+        self.orders[3].save()
+        changes = [
+            {'order_id': self.orders[0].id, 'delivery_crew_id': self.crew.id},
+            {'order_id': self.orders[1].id, 'delivery_crew_id': self.other_crew.id},
+            {'order_id': self.orders[2].id, 'delivery_crew_id': self.customer.id},
+            {'order_id': self.orders[3].id, 'delivery_crew_id': self.crew.id},
+            {'order_id': 999999, 'delivery_crew_id': self.crew.id},
+        ]
+        with mock.patch('LittleLemonAPI.events.get_broker') as get_broker_mock:
+            with CaptureQueriesContext(connection) as context:
+                response = self.post(self.manager, '/api/assign-orders', changes)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['result'] for row in response.data['results']],
+                         ['updated', 'updated', 'invalid_delivery_crew', 'unchanged', 'not_found'])
+        updates = [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+
+        crews = dict(Order.objects.values_list('id', 'delivery_crew_id'))
+        self.assertEqual(crews[self.orders[0].id], self.crew.id)
+        self.assertEqual(crews[self.orders[1].id], self.other_crew.id)
+        self.assertIsNone(crews[self.orders[2].id])
+        self.orders[0].refresh_from_db()
+        self.assertGreater(self.orders[0].updated_at, self.orders[2].updated_at)
+
+        published = [(user_id, event['event'], event['order'])
+                     for (user_id, event), _ in get_broker_mock.return_value.publish.call_args_list]
+        self.assertEqual(published, [
+            (self.crew.id, 'assigned', self.orders[0].id),
+            (self.other_crew.id, 'assigned', self.orders[1].id),
+        ])
+
+    def test_assign_validation(self):
+        response = self.post(self.customer, '/api/assign-orders', [])
+        self.assertEqual(response.status_code, 403)
+        response = self.post(self.manager, '/api/assign-orders', [])
+        self.assertEqual(response.status_code, 400)
+        order_id = self.orders[0].id
+        response = self.post(self.manager, '/api/assign-orders', [
+            {'order_id': order_id, 'delivery_crew_id': self.crew.id},
+            {'order_id': order_id, 'delivery_crew_id': None},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(1, response.data)
+
+    def test_status_updates_are_limited_to_the_crew_members_orders(self):
+        Order.objects.filter(id__in=[self.orders[0].id, self.orders[1].id]).update(delivery_crew=self.crew)
+        changes = [{'order_id': order.id, 'status': 1} for order in self.orders[:3]]
+        response = self.post(self.crew, '/api/update-orders-status', changes)
+        self.assertEqual([row['result'] for row in response.data['results']], ['updated', 'updated', 'not_found'])
+
+        response = self.post(self.manager, '/api/update-orders-status', changes + [{'order_id': self.orders[3].id, 'status': 0}])
+        self.assertEqual([row['result'] for row in response.data['results']], ['unchanged', 'unchanged', 'updated', 'unchanged'])
+        self.assertEqual(list(Order.objects.order_by('id').values_list('status', flat=True)), [1, 1, 1, 0])
+
+        response = self.post(self.manager, '/api/update-orders-status', [{'order_id': self.orders[0].id, 'status': 7}])
+        self.assertEqual(response.status_code, 400)
+
+
+class OrderExportTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.items = self.make_items(2)
+        self.orders = []
+        for day, status in [(1, 0), (2, 1), (3, 0)]:
+            order = Order.objects.create(
+                user=self.customer, status=status, total=Decimal('10.00'),
+                date=datetime.datetime(2024, 5, day, 12, 30, tzinfo=datetime.timezone.utc),
+            )
+            self.orders.append(order)
+        for item in self.items:
+            OrderItem.objects.create(order=self.orders[0], menuitem=item, quantity=2, unit_price=5, price=10)
+        self.client.force_authenticate(self.manager)
+
+    def read(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_ndjson_has_one_line_per_order(self):
+        response, body = self.read('/api/orders/export')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([r['id'] for r in records], [o.id for o in self.orders])
+        self.assertEqual(records[0]['date'], '2024-05-01T12:30:00Z')
+        self.assertEqual(records[0]['total'], '10.00')
+        self.assertEqual([i['menuitem_title'] for i in records[0]['order_items']], ['Item 000', 'Item 001'])
+        self.assertEqual(records[1]['order_items'], [])
+
+    def test_csv_has_one_row_per_item(self):
+        response, body = self.read('/api/orders/export?output=csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="orders.csv"')
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0], export.CSV_HEADER)
+        self.assertEqual([row[0] for row in rows[1:]], [str(self.orders[0].id)] * 2 + [str(self.orders[1].id), str(self.orders[2].id)])
+        self.assertEqual(rows[1][8:], ['Item 000', '2', '5.00', '10.00'])
+
+    def test_csv_neutralizes_formulas(self):
+        MenuItem.objects.filter(pk=self.items[0].pk).update(title='=HYPERLINK("http://example.com")')
+        MenuItem.objects.filter(pk=self.items[1].pk).update(title='-2+3')
+        _, body = self.read('/api/orders/export?output=csv')
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual([row[8] for row in rows[1:3]], ['\'=HYPERLINK("http://example.com")', "'-2+3"])
+        # Only the CSV is escaped.
+        _, body = self.read('/api/orders/export')
+        self.assertEqual(json.loads(body.splitlines()[0])['order_items'][1]['menuitem_title'], '-2+3')
+
+    def test_filters(self):
+        _, body = self.read('/api/orders/export?date_from=2024-05-02&date_to=2024-05-03&status=0')
+        self.assertEqual([json.loads(line)['id'] for line in body.splitlines()], [self.orders[2].id])
+        _, body = self.read('/api/orders/export?date_to=2024-05-02T12:30:00Z')
+        self.assertEqual(len(body.splitlines()), 2)
+        self.assertEqual(self.client.get('/api/orders/export?date_from=yesterday').status_code, 400)
+        self.assertEqual(self.client.get('/api/orders/export?status=7').status_code, 400)
+        self.assertEqual(self.client.get('/api/orders/export?output=xml').status_code, 400)
+
+    def test_reads_in_constant_size_batches(self):
+        with mock.patch.object(OrderExportView, 'batch_size', 2):
+            with CaptureQueriesContext(connection) as queries:
+                _, body = self.read('/api/orders/export')
+        self.assertEqual(len(body.splitlines()), 3)
+        # Two batches of orders, each followed by one query for its items.
+        self.assertEqual(len([q for q in queries if 'LittleLemonAPI_order' in q['sql']]), 4)
+
+    def test_managers_only(self):
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/orders/export').status_code, 403)
+
+
+class SalesRollupTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.manager.is_staff = True
+        self.manager.save()
+        self.items = self.make_items(2)
+        self.desserts = Category.objects.create(slug='desserts', title='Desserts')
+        MenuItem.objects.filter(pk=self.items[1].pk).update(category=self.desserts)
+
+    def checkout(self, user, lines):
+        Cart.objects.bulk_create([
+            Cart(user=user, menuitem=item, quantity=quantity, unit_price=item.price, price=item.price * quantity)
+            for item, quantity in lines
+        ])
+        self.client.force_authenticate(user)
+        response = self.client.post('/api/orders', {'status': 0}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def snapshot(self):
+        return (
+            sorted(DailySalesRollup.objects.values_list('day', 'menuitem_id', 'revenue', 'quantity', 'order_count')),
+            sorted(DailyOrderRollup.objects.values_list('day', 'revenue', 'order_count')),
+        )
+
+    def test_checkout_updates_rollups_incrementally(self):
+        self.checkout(self.customer, [(self.items[0], 2), (self.items[1], 1)])
+        self.checkout(self.manager, [(self.items[0], 1)])
+        today = timezone.localdate()
+        self.assertEqual(self.snapshot(), (
+            [(today, self.items[0].id, Decimal('15.00'), 3, 2), (today, self.items[1].id, Decimal('5.00'), 1, 1)],
+            [(today, Decimal('20.00'), 2)],
+        ))
+
+    def test_rebuild_matches_incremental_rollups_and_deletes_are_subtracted(self):
+        first = self.checkout(self.customer, [(self.items[0], 2), (self.items[1], 1)])
+        self.checkout(self.manager, [(self.items[1], 3)])
+        incremental = self.snapshot()
+        rollup.rebuild()
+        self.assertEqual(self.snapshot(), incremental)
+
+        Order.objects.get(pk=first).delete()
+        after_delete = self.snapshot()
+        rollup.rebuild()
+        self.assertEqual(self.snapshot(), after_delete)
+        self.assertEqual(after_delete[1][0][1:], (Decimal('15.00'), 1))
+
+    def test_report_endpoint(self):
+        self.checkout(self.customer, [(self.items[0], 2), (self.items[1], 1)])
+        self.client.force_authenticate(self.manager)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/reports/sales?group_by=category')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('LittleLemonAPI_order' in q['sql'] for q in queries))
+        self.assertEqual(response.data['revenue'], '15.00')
+        self.assertEqual(response.data['orders'], 1)
+        self.assertEqual([(r['category'], r['revenue']) for r in response.data['results']],
+                         [('Mains', '10.00'), ('Desserts', '5.00')])
+
+        response = self.client.get('/api/reports/sales?group_by=item')
+        self.assertEqual([(r['title'], r['quantity'], r['orders']) for r in response.data['results']],
+                         [('Item 000', 2, 1), ('Item 001', 1, 1)])
+        response = self.client.get('/api/reports/sales?date_to=2000-01-01')
+        self.assertEqual((response.data['revenue'], response.data['results']), ('0.00', []))
+        self.assertEqual(self.client.get('/api/reports/sales?group_by=week').status_code, 400)
+        self.assertEqual(self.client.get('/api/reports/sales?date_from=soon').status_code, 400)
+
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/reports/sales').status_code, 403)
+
+
+class ExplainQueriesTests(APITestCase):
+    def test_every_view_query_uses_an_index(self):
+        out = io.StringIO()
+        # Against the test database, inside this test's transaction.
+        with mock.patch.object(explain_queries, 'isolated_database', contextlib.nullcontext):
+            call_command('explain_queries', stdout=out, verbosity=2)
+        output = out.getvalue()
+        self.assertIn('menu-items: ok\n', output)
+        self.assertIn('orders (manager, next page): ok\n', output)
+        self.assertIn('categories: ok', output)
+        self.assertNotIn('FULL SCAN', output)
+        # The plans themselves, indented under each label.
+        self.assertRegex(output, r'\n    .*(SEARCH|Index)')
+
+
+class DatabaseProfileTests(TestCase):
+    def test_sqlite_connections_get_the_configured_pragmas(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 20000)
+
+
+class StartupTests(SimpleTestCase):
+    # Which modules a fresh process loads, not how long it takes: timings
+    # vary with the machine, so the time budget is checked by
+    # `manage.py bench_startup --check` instead.
+    def test_setup_leaves_heavy_modules_to_the_first_request(self):
+        probe = startup.run_probe()
+        self.assertEqual([name for name in startup.DEFERRED_MODULES if name in probe['after_setup']], [])
+        self.assertLessEqual(probe['modules'], startup.MODULE_BUDGET)
+
+
+THROTTLE_RATES = {'anon': '1/minute', 'user': '2/minute', 'menu': '3/minute', 'checkout': '1/minute'}
+
+
+@override_settings(REST_FRAMEWORK=dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES=THROTTLE_RATES))
+class ThrottleTests(APITestCase):
+    def statuses(self, url, count, method='get'):
+        return [getattr(self.client, method)(url).status_code for _ in range(count)]
+
+    def test_view_scopes_have_their_own_rates_and_counters(self):
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.statuses('/api/menu-items', 4), [200, 200, 200, 429])
+        self.assertEqual(self.statuses('/api/cart/menu-items', 3), [200, 200, 429])
+        # Checkout is its own scope; listing orders uses 'user', already spent.
+        self.assertEqual(self.statuses('/api/orders', 2, 'post'), [400, 429])
+        self.assertEqual(self.statuses('/api/orders', 1), [429])
+
+    def test_scope_attribute_is_enough_for_a_subclass(self):
+        class MenuThrottle(throttling.FixedWindowRateThrottle):
+            scope = 'menu'
+
+        request = RequestFactory().get('/')
+        request.user = self.customer
+        self.assertEqual([MenuThrottle().allow_request(request, None) for _ in range(4)], [True, True, True, False])
+        self.assertTrue(throttling.FixedWindowRateThrottle().allow_request(request, None))
+
+    def test_rejection_reports_time_to_the_next_window(self):
+        self.client.logout()
+        self.assertEqual(self.statuses('/api/categories', 2), [200, 429])
+        response = self.client.get('/api/categories')
+        self.assertTrue(0 < int(response['Retry-After']) <= 60)
+
+    def test_sqlite_store_is_shared_between_instances(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = directory.name + '/throttle.sqlite3'
+        first = throttling.SQLiteCounterStore(path)
+        second = throttling.SQLiteCounterStore(path)
+        self.assertEqual([first.incr('user:1', 10, 0), second.incr('user:1', 10, 0), first.incr('user:2', 10, 0)], [1, 2, 1])
+        # A new window starts from one.
+        self.assertEqual(second.incr('user:1', 11, 0), 1)
+
+        def hammer():
+            store = throttling.SQLiteCounterStore(path)
+            for _ in range(50):
+                store.incr('user:3', 1, 0)
+
+        threads = [threading.Thread(target=hammer) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(first.incr('user:3', 1, 0), 201)
+
+        with override_settings(THROTTLE_COUNTER_STORE={
+                'BACKEND': 'LittleLemonAPI.throttling.SQLiteCounterStore', 'OPTIONS': {'path': path}}):
+            self.client.force_authenticate(self.customer)
+            self.assertEqual(self.statuses('/api/cart/menu-items', 3), [200, 200, 429])
+            self.assertIsInstance(throttling.get_counter_store(), throttling.SQLiteCounterStore)
+        self.assertIsInstance(throttling.get_counter_store(), throttling.CacheCounterStore)
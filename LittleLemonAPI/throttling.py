@@ -0,0 +1,168 @@
+import itertools
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+class CacheCounterStore:
+    # Fixed-window counters as cache keys (one per key and window) using
+    # add() + incr(). Atomic on locmem, Redis and memcached; shared between
+    # processes only if the cache is. There is no clear(): the keys can't be
+    # told apart from the rest of the cache, so give the store an alias of
+    # its own and clear that.
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    def incr(self, key, period, expires):
+        cache = caches[self.alias]
+        key = 'throttle:%s:%d' % (key, period)
+        timeout = max(1, int(expires - time.time()) + 1)
+        cache.add(key, 0, timeout)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Evicted between add() and incr().
+            cache.set(key, 1, timeout)
+            return 1
+
+
+class SQLiteCounterStore:
+    # Counters in a SQLite file of their own, shared by every worker process
+    # on the host: one row per key, reset when a new window starts, and one
+    # upsert per request. A stand-in for Redis INCR on a single machine.
+    INCR_SQL = '''
+        INSERT INTO throttle_counter (key, period, expires, count) VALUES (?, ?, ?, 1)
+        ON CONFLICT (key) DO UPDATE SET
+            count = CASE WHEN throttle_counter.period = excluded.period THEN throttle_counter.count + 1 ELSE 1 END,
+            period = excluded.period,
+            expires = excluded.expires
+        RETURNING count
+    '''
+
+    def __init__(self, path, timeout=5, prune_every=10000):
+        self.path = str(path)
+        self.timeout = timeout
+        self.prune_every = prune_every
+        self._calls = itertools.count(1)
+        self._local = threading.local()
+
+    def connection(self):
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode = WAL')
+            # Losing the last few increments in a power cut is harmless.
+            conn.execute('PRAGMA synchronous = OFF')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS throttle_counter '
+                '(key TEXT PRIMARY KEY, period INTEGER NOT NULL, expires REAL NOT NULL, count INTEGER NOT NULL)'
+            )
+            self._local.connection = conn
+        return conn
+
+    def incr(self, key, period, expires):
+        conn = self.connection()
+        count = conn.execute(self.INCR_SQL, (key, period, expires)).fetchone()[0]
+        if next(self._calls) % self.prune_every == 0:
+            # Rows of clients that went quiet.
+            conn.execute('DELETE FROM throttle_counter WHERE expires < ?', (time.time(),))
+        return count
+
+    def clear(self):
+        self.connection().execute('DELETE FROM throttle_counter')
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_counter_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = getattr(settings, 'THROTTLE_COUNTER_STORE', {})
+                backend = import_string(config.get('BACKEND', 'LittleLemonAPI.throttling.CacheCounterStore'))
+                _store = backend(**config.get('OPTIONS', {}))
+    return _store
+
+
+def reset_counter_store():
+    global _store
+    _store = None
+
+
+def parse_rate(rate):
+    # DRF's '<requests>/<period>' format, e.g. '10/minute'.
+    num, period = rate.split('/')
+    return int(num), DURATIONS[period[0]]
+
+
+class FixedWindowRateThrottle(BaseThrottle):
+    # Like DRF's SimpleRateThrottle, but counts requests in fixed windows with
+    # one atomic increment instead of rewriting a list of timestamps, so a
+    # check costs the same however close the client is to its limit. Rates
+    # come from DEFAULT_THROTTLE_RATES and are read on every call, so
+    # override_settings applies. Rejected requests count too. `scope` names
+    # the rate, as in DRF; subclasses may pick it per request in get_scope(),
+    # and None lets the request through uncounted.
+    scope = None
+
+    def get_scope(self, request, view):
+        return self.scope
+
+    def get_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return self.get_ident(request)
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        if scope is None:
+            return True
+        num_requests, duration = parse_rate(api_settings.DEFAULT_THROTTLE_RATES[scope])
+        self.now = time.time()
+        period = int(self.now // duration)
+        self.expires = (period + 1) * duration
+        count = get_counter_store().incr('%s:%s' % (scope, self.get_key(request)), period, self.expires)
+        return count <= num_requests
+
+    def wait(self):
+        return max(0.0, self.expires - self.now)
+
+
+class AnonRateThrottle(FixedWindowRateThrottle):
+    # The 'anon' rate, per client address.
+    scope = 'anon'
+
+    def get_scope(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.scope
+
+
+class UserRateThrottle(FixedWindowRateThrottle):
+    # Per signed-in user. Views pick a rate of their own with throttle_scope
+    # (or get_throttle_scope(request) when it depends on the method); it is
+    # counted separately from, and instead of, the general 'user' rate. A
+    # scope without a configured rate falls back to 'user'.
+    scope = 'user'
+
+    def get_scope(self, request, view):
+        if not (request.user and request.user.is_authenticated):
+            return None
+        if hasattr(view, 'get_throttle_scope'):
+            scope = view.get_throttle_scope(request)
+        else:
+            scope = getattr(view, 'throttle_scope', None)
+        if scope in api_settings.DEFAULT_THROTTLE_RATES:
+            return scope
+        return self.scope
@@ -1,6 +1,15 @@
-from django.urls import path, include
-from rest_framework import routers
-from .views import * 
+from django.urls import path
+from .views import (
+    AssignOrderToDeliveryCrewView, BatchAssignOrdersView, BatchUpdateOrderStatusView, CartManagementView,
+    CategoryCreateView, CategoryListView, DeliveryCrewOrderListView, DeliveryCrewOrderUpdateView,
+    ListCreateDeliveryCrewUsers, ListCreateManagerUsers, MenuItemDetail, MenuItemList, MetricsView, OrderDetailView,
+    OrderExportView, OrderListCreateView, RemoveDeliveryCrewUser, RemoveManagerUser, SalesReportView,
+    UpdateItemOfTheDayView, UpdateOrderStatusView,
+)
+from .async_views import (
+    AsyncCategoryListView, AsyncDeliveryCrewOrderListView, AsyncMenuItemDetail, AsyncMenuItemList, AsyncOrderDetailView,
+    AsyncOrderEventStream,
+)
 
 # router = routers.DefaultRouter()
 # router.register(r'menu-items', MenuItemViewSet, basename='menuitem')
@@ -13,6 +22,8 @@ urlpatterns = [
     path('update-item-of-the-day/<int:menu_item_id>', UpdateItemOfTheDayView.as_view(), name='update-item-of-the-day'),
     path('assign-order/<int:order_id>/<int:user_id>', AssignOrderToDeliveryCrewView.as_view(), name='assign-order'),
     path('update-order-status/<int:order_id>', UpdateOrderStatusView.as_view(), name='update-order-status'),
+    path('assign-orders', BatchAssignOrdersView.as_view(), name='assign-orders'),
+    path('update-orders-status', BatchUpdateOrderStatusView.as_view(), name='update-orders-status'),
     path('menu-items', MenuItemList.as_view(), name='menuitem-list'),
     path('menu-items/<int:pk>', MenuItemDetail.as_view(), name='menuitem-detail'),
     path('groups/manager/users', ListCreateManagerUsers.as_view(), name='list-create-manager-users'),
@@ -21,10 +32,21 @@ urlpatterns = [
     path('groups/delivery-crew/users/<int:user_id>', RemoveDeliveryCrewUser.as_view(), name='remove-delivery-crew-user'),
     path('cart/menu-items', CartManagementView.as_view(), name='cart-management'),
     path('orders', OrderListCreateView.as_view(), name='order-list-create'),
+    path('orders/export', OrderExportView.as_view(), name='order-export'),
     path('orders/<int:pk>', OrderDetailView.as_view(), name='order-detail'),
     path('delivery-crew/orders', DeliveryCrewOrderListView.as_view(), name='delivery-crew-order-list'),
     path('delivery-crew/orders/<int:pk>', DeliveryCrewOrderUpdateView.as_view(), name='delivery-crew-order-update'),
     path('categories', CategoryListView.as_view(), name='categories'),
+    path('reports/sales', SalesReportView.as_view(), name='sales-report'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
+    # Async read-only versions of the hot GET endpoints, for ASGI deployments.
+    path('async/menu-items', AsyncMenuItemList.as_view(), name='async-menuitem-list'),
+    path('async/menu-items/<int:pk>', AsyncMenuItemDetail.as_view(), name='async-menuitem-detail'),
+    path('async/categories', AsyncCategoryListView.as_view(), name='async-categories'),
+    path('async/delivery-crew/orders', AsyncDeliveryCrewOrderListView.as_view(), name='async-delivery-crew-order-list'),
+    path('async/orders/<int:pk>', AsyncOrderDetailView.as_view(), name='async-order-detail'),
+    # Server-sent events for delivery crew; ASGI only.
+    path('delivery-crew/orders/events', AsyncOrderEventStream.as_view(), name='delivery-crew-order-events'),
     # path('manager/orders/<int:pk>', ManagerOrderDetailView.as_view(), name='manager-order-detail'),
     # path('cart/menu-items/delete', CartDeleteAllView.as_view(), name='cart-delete-all'),
     # path('register/', RegisterView.as_view(), name='register'),
@@ -0,0 +1,98 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+# Kept apart from authentication.py, which pulls in simplejwt, so the
+# invalidation signals don't load it at startup.
+
+
+class UserCache:
+    # Short-lived in-process LRU of token -> (user, auth) for the token
+    # authenticators in authentication.py, so a repeat request skips the user
+    # SELECT (and, for JWTs, the signature check). Entries never outlive the
+    # token and are dropped when the user is saved or deleted or the token is
+    # deleted (see signals.py). Other processes only notice after AUTH_CACHE_TIMEOUT,
+    # which bounds how long a change can go unseen; 0 disables the cache.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_timeout(self):
+        return getattr(settings, 'AUTH_CACHE_TIMEOUT', 60)
+
+    def get(self, key):
+        if not self.get_timeout():
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # A copy, so nothing a request does to its user leaks into the next.
+        return copy.copy(entry[1]), entry[2]
+
+    def set(self, key, user, auth, expires=None):
+        timeout = self.get_timeout()
+        if not timeout:
+            return
+        expires = min(time.time() + timeout, expires or float('inf'))
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (expires, copy.copy(user), auth)
+            self._keys_by_user.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > getattr(settings, 'AUTH_CACHE_SIZE', 10000):
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._keys_by_user.get(entry[1].pk)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_user[entry[1].pk]
+
+    def invalidate(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+user_cache = UserCache()
+
+
+def jwt_cache_key(raw_token):
+    return 'jwt:%s' % raw_token.decode('latin-1')
+
+
+def token_cache_key(key):
+    return 'token:%s' % key
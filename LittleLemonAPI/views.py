@@ -1,34 +1,43 @@
-from django.shortcuts import render
-from .models import *
-from .serializers import *
-from rest_framework.views import APIView
-from rest_framework.response import Response
-from rest_framework import status
-from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import Group, User
-from rest_framework.permissions import IsAdminUser
-from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework import generics
-from .permissions import IsManager
-from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import OrderingFilter
-from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
-from rest_framework import viewsets
-from rest_framework.decorators import action
-from rest_framework.decorators import permission_classes
-from rest_framework.exceptions import NotFound
-from django.contrib.auth import authenticate
-from decimal import InvalidOperation, Decimal
+from django.db import transaction
+from django.db.models import Sum
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import generics, serializers, status
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .catalog import CatalogCacheMixin, catalog_cache
+from .conditional import ConditionalMixin, make_etag
+from .export import buffered, csv_lines, filter_orders, iter_orders, ndjson_lines
+from .fast_serializers import FastMenuItemSerializer, FastOrderSerializer, FastSerializerMixin
+from .filters import MenuItemFilter
+from .metrics import registry
+from .models import Cart, Category, DailyOrderRollup, DailySalesRollup, MenuItem, Order
+from .pagination import MenuItemPagination, OrderPagination
+from .permissions import IsManager
+from .roles import DELIVERY_CREW, is_manager
+from .serializers import (
+    CartLineSerializer, CartSerializer, CategorySerializer, MenuItemSerializer, OrderAssignmentSerializer,
+    OrderSerializer, OrderStatusChangeSerializer, SalesByCategorySerializer, SalesByDaySerializer,
+    SalesByItemSerializer, UserSerializer, increment_cart_lines, update_orders,
+)
+from .usercache import user_cache
 
 # Create your views here.
 #__________________________________
 
 #Menu-items endpoints
-class MenuItemList(generics.ListCreateAPIView):
-    queryset = MenuItem.objects.all()
+class MenuItemList(ConditionalMixin, CatalogCacheMixin, FastSerializerMixin, generics.ListCreateAPIView):
+    queryset = MenuItem.objects.with_category()
     serializer_class = MenuItemSerializer
+    fast_serializer_class = FastMenuItemSerializer
+    pagination_class = MenuItemPagination
+    throttle_scope = 'menu'
+    filterset_class = MenuItemFilter
+    ordering_fields = ['price', 'title', 'id']
 
     def get_permissions(self):
         if self.request.method == 'GET':
@@ -38,9 +47,11 @@ class MenuItemList(generics.ListCreateAPIView):
         else:
             return [IsAdminUser()]
 
-class MenuItemDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = MenuItem.objects.all()
+class MenuItemDetail(ConditionalMixin, CatalogCacheMixin, FastSerializerMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = MenuItem.objects.with_category()
     serializer_class = MenuItemSerializer
+    fast_serializer_class = FastMenuItemSerializer
+    throttle_scope = 'menu'
 
     def get_permissions(self):
         if self.request.method == 'GET':
@@ -133,10 +144,38 @@ class RemoveDeliveryCrewUser(generics.DestroyAPIView):
 class CartManagementView(generics.ListCreateAPIView, generics.DestroyAPIView):
     serializer_class = CartSerializer
     permission_classes = [IsAuthenticated]
+    max_batch_size = 100
 
     def get_queryset(self):
         return Cart.objects.filter(user=self.request.user)
 
+    def create(self, request, *args, **kwargs):
+        # A JSON list adds or updates many lines at once and returns the cart.
+        # With ?mode=increment quantities are added to existing lines instead
+        # of replacing them.
+        increment = request.query_params.get('mode') == 'increment'
+        if not isinstance(request.data, list):
+            if not increment:
+                return super().create(request, *args, **kwargs)
+            line = CartLineSerializer(data=request.data)
+            line.is_valid(raise_exception=True)
+            cart = increment_cart_lines(request.user, [line.validated_data])[0]
+            return Response(self.get_serializer(cart).data, status=status.HTTP_201_CREATED)
+
+        if increment:
+            # Repeated menu items simply add up, so the plain ListSerializer
+            # is enough here.
+            serializer = serializers.ListSerializer(
+                child=CartLineSerializer(), data=request.data, allow_empty=False, max_length=self.max_batch_size)
+            serializer.is_valid(raise_exception=True)
+            increment_cart_lines(request.user, serializer.validated_data)
+        else:
+            serializer = CartLineSerializer(data=request.data, many=True, allow_empty=False, max_length=self.max_batch_size)
+            serializer.is_valid(raise_exception=True)
+            serializer.save(user=request.user)
+        cart = self.get_serializer(self.get_queryset(), many=True)
+        return Response(cart.data, status=status.HTTP_201_CREATED)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
@@ -148,46 +187,89 @@ class CartManagementView(generics.ListCreateAPIView, generics.DestroyAPIView):
 #______________________________________________________________________________________________________________________________
 
 #Order management endpoints    
-class OrderListCreateView(generics.ListCreateAPIView):
+class OrderListCreateView(FastSerializerMixin, generics.ListCreateAPIView):
     serializer_class = OrderSerializer
+    fast_serializer_class = FastOrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = OrderPagination
+    ordering_fields = ['date', 'id', 'status']
+
+    def get_throttle_scope(self, request):
+        return 'checkout' if request.method == 'POST' else None
 
     def get_queryset(self):
-        if self.request.user.groups.filter(name='Manager').exists():
-            return Order.objects.all()
-        return Order.objects.filter(user=self.request.user)
+        if is_manager(self.request):
+            return Order.objects.with_items()
+        return Order.objects.with_items().filter(user=self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
+class OrderExportView(APIView):
+    # Streams the whole (filtered) order history with its items; see export.py.
+    # ?output=ndjson (default) or csv. Not ?format=, which DRF reserves for
+    # picking a renderer.
+    permission_classes = [IsAdminUser | IsManager]
+    batch_size = 500
+    outputs = {
+        'ndjson': (ndjson_lines, 'application/x-ndjson', 'orders.ndjson'),
+        'csv': (csv_lines, 'text/csv; charset=utf-8', 'orders.csv'),
+    }
+
+    def get(self, request):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in self.outputs:
+            return Response({'output': 'Must be one of %s.' % ', '.join(self.outputs)}, status=status.HTTP_400_BAD_REQUEST)
+        lines, content_type, filename = self.outputs[output]
+        queryset = filter_orders(request.query_params)
+        response = StreamingHttpResponse(buffered(lines(iter_orders(queryset, self.batch_size))), content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="%s"' % filename
+        return response
+
+class OrderDetailView(ConditionalMixin, FastSerializerMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = OrderSerializer
+    fast_serializer_class = FastOrderSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        if self.request.user.groups.filter(name='Manager').exists():
-            return Order.objects.all()
-        return Order.objects.filter(user=self.request.user)
+        if is_manager(self.request):
+            return Order.objects.with_items()
+        return Order.objects.with_items().filter(user=self.request.user)
+
+    def get_validators(self, request):
+        updated_at = (
+            self.get_queryset().prefetch_related(None).filter(pk=self.kwargs['pk'])
+            .values_list('updated_at', flat=True).first()
+        )
+        if updated_at is None:
+            return None, None
+        # The nested menu items are rendered from the catalog, so its changes
+        # count as well.
+        etag = make_etag('order', self.kwargs['pk'], updated_at.timestamp(), catalog_cache.version(),
+                         request.accepted_renderer.format)
+        return etag, max(updated_at.timestamp(), catalog_cache.last_modified())
 
     def update(self, request, *args, **kwargs):
         order = self.get_object()
-        if order.user != request.user and not self.request.user.groups.filter(name='Manager').exists():
+        if order.user != request.user and not is_manager(self.request):
             return Response({"detail": "Not authorized to update this order."}, status=status.HTTP_403_FORBIDDEN)
         return super().update(request, *args, **kwargs)
 
     def delete(self, request, *args, **kwargs):
         order = self.get_object()
-        if order.user != request.user and not self.request.user.groups.filter(name='Manager').exists():
+        if order.user != request.user and not is_manager(self.request):
             return Response({"detail": "Not authorized to delete this order."}, status=status.HTTP_403_FORBIDDEN)
         return super().delete(request, *args, **kwargs)
     
-class DeliveryCrewOrderListView(generics.ListAPIView):
+class DeliveryCrewOrderListView(FastSerializerMixin, generics.ListAPIView):
     serializer_class = OrderSerializer
+    fast_serializer_class = FastOrderSerializer
     permission_classes = [IsAuthenticated]
+    ordering_fields = ['date', 'id', 'status']
 
     def get_queryset(self):
         # Only show orders assigned to the delivery crew
-        return Order.objects.filter(delivery_crew=self.request.user)
+        return Order.objects.with_items().filter(delivery_crew=self.request.user)
 
 class DeliveryCrewOrderUpdateView(generics.UpdateAPIView):
     serializer_class = OrderSerializer
@@ -195,7 +277,7 @@ class DeliveryCrewOrderUpdateView(generics.UpdateAPIView):
 
     def get_queryset(self):
         # Only show orders assigned to the delivery crew
-        return Order.objects.filter(delivery_crew=self.request.user)
+        return Order.objects.with_items().filter(delivery_crew=self.request.user)
 
     def update(self, request, *args, **kwargs):
         # Ensure delivery crew can only update the status
@@ -224,12 +306,64 @@ class UpdateOrderStatusView(APIView):
         order.status = True
         order.save()
         return Response({'status': 'order marked as delivered'})
+
+class BatchOrderUpdateView(APIView):
+    # POST a list of changes; each order is reported as updated, unchanged,
+    # not_found (or out of reach of the caller) or, for assignments,
+    # invalid_delivery_crew. Valid changes are applied even if others fail.
+    serializer_class = None
+    field = None
+    max_batch_size = 500
+
+    def get_queryset(self):
+        return Order.objects.all()
+
+    def check_changes(self, changes):
+        return {}
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data, many=True, allow_empty=False, max_length=self.max_batch_size)
+        serializer.is_valid(raise_exception=True)
+        changes = serializer.validated_data
+        results = self.check_changes(changes)
+        values = {change['order_id']: change[self.field] for change in changes if change['order_id'] not in results}
+        results.update(update_orders(self.get_queryset(), values, self.field))
+        return Response({'results': [
+            {'order_id': change['order_id'], 'result': results[change['order_id']]} for change in changes
+        ]})
+
+class BatchAssignOrdersView(BatchOrderUpdateView):
+    permission_classes = [IsAdminUser | IsManager]
+    serializer_class = OrderAssignmentSerializer
+    field = 'delivery_crew_id'
+
+    def check_changes(self, changes):
+        # Crew membership of every referenced user, in one query.
+        crew_ids = {change['delivery_crew_id'] for change in changes} - {None}
+        crew = set(User.objects.filter(pk__in=crew_ids, groups__name=DELIVERY_CREW).values_list('pk', flat=True))
+        return {
+            change['order_id']: 'invalid_delivery_crew'
+            for change in changes
+            if change['delivery_crew_id'] is not None and change['delivery_crew_id'] not in crew
+        }
+
+class BatchUpdateOrderStatusView(BatchOrderUpdateView):
+    # Managers can change any order, delivery crew only their own.
+    permission_classes = [IsAuthenticated]
+    serializer_class = OrderStatusChangeSerializer
+    field = 'status'
+
+    def get_queryset(self):
+        if self.request.user.is_staff or is_manager(self.request):
+            return Order.objects.all()
+        return Order.objects.filter(delivery_crew=self.request.user)
 #_________________________________________________________________________________________________________________________
     
-class CategoryListView(generics.ListAPIView):
+class CategoryListView(ConditionalMixin, CatalogCacheMixin, generics.ListAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [AllowAny] 
+    throttle_scope = 'menu'
     
 class CategoryCreateView(generics.CreateAPIView):
     queryset = Category.objects.all()
@@ -240,10 +374,74 @@ class UpdateItemOfTheDayView(APIView):
     permission_classes = [IsAdminUser | IsManager]
 
     def post(self, request, menu_item_id):
-        menu_item = MenuItem.objects.get(id=menu_item_id)
-        menu_item.featured = True
-        menu_item.save()
+        # A queryset update skips post_save and auto_now, so set updated_at
+        # and bump the catalog version here, once committed (see signals.py).
+        if not MenuItem.objects.filter(id=menu_item_id).update(featured=True, updated_at=timezone.now()):
+            return Response({'error': 'menu item not found'}, status=status.HTTP_404_NOT_FOUND)
+        transaction.on_commit(catalog_cache.bump)
         return Response({'status': 'item updated as featured'})
+
+class SalesReportView(APIView):
+    # Reads only the daily rollups (see rollup.py), so the cost depends on the
+    # number of days and menu items in range, not on the number of orders.
+    permission_classes = [IsAdminUser | IsManager]
+
+    def get(self, request):
+        group_by = request.query_params.get('group_by', 'day')
+        if group_by not in ('day', 'category', 'item'):
+            return Response({'group_by': 'Must be one of day, category, item.'}, status=status.HTTP_400_BAD_REQUEST)
+        days = DailyOrderRollup.objects.all()
+        items = DailySalesRollup.objects.all()
+        for param, lookup in (('date_from', 'day__gte'), ('date_to', 'day__lte')):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    day = parse_date(value)
+                except ValueError:
+                    day = None
+                if day is None:
+                    return Response({param: 'Expected a date (YYYY-MM-DD).'}, status=status.HTTP_400_BAD_REQUEST)
+                days = days.filter(**{lookup: day})
+                items = items.filter(**{lookup: day})
+
+        totals = days.aggregate(revenue=Sum('revenue'), orders=Sum('order_count'))
+        if group_by == 'day':
+            results = SalesByDaySerializer(days.order_by('day'), many=True).data
+        elif group_by == 'category':
+            rows = (
+                items.values('menuitem__category_id', 'menuitem__category__title')
+                .annotate(revenue=Sum('revenue'), quantity=Sum('quantity'))
+                .order_by('-revenue', 'menuitem__category_id')
+            )
+            results = SalesByCategorySerializer(rows, many=True).data
+        else:
+            rows = (
+                items.values('menuitem_id', 'menuitem__title', 'menuitem__category__title')
+                .annotate(revenue=Sum('revenue'), quantity=Sum('quantity'), order_count=Sum('order_count'))
+                .order_by('-revenue', 'menuitem_id')
+            )
+            results = SalesByItemSerializer(rows, many=True).data
+        return Response({
+            'group_by': group_by,
+            # Formatted like the revenue of each row, never through float.
+            'revenue': serializers.DecimalField(max_digits=12, decimal_places=2).to_representation(totals['revenue'] or 0),
+            'orders': totals['orders'] or 0,
+            'results': results,
+        })
+
+class MetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        cache_stats = catalog_cache.stats()
+        auth_stats = user_cache.stats()
+        body = registry.export(extra=[
+            ('littlelemon_catalog_cache_hits_total', 'Catalog cache hits.', cache_stats['hits']),
+            ('littlelemon_catalog_cache_misses_total', 'Catalog cache misses.', cache_stats['misses']),
+            ('littlelemon_auth_cache_hits_total', 'Authenticated user cache hits.', auth_stats['hits']),
+            ('littlelemon_auth_cache_misses_total', 'Authenticated user cache misses.', auth_stats['misses']),
+        ])
+        return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
 #_______________________________________________________________________________________________________________________________
     
 # class AddToCartView(generics.CreateAPIView):